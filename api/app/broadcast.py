@@ -0,0 +1,55 @@
+from __future__ import annotations
+from typing import Optional, Set
+import asyncio
+import json
+
+QUEUE_SIZE = 8
+
+def sse(event: str, data: bytes) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+class Subscriber:
+    def __init__(self, maxsize: int = QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+class Broadcaster:
+    """
+    Fan-out of state-change events to /stream clients. Each client has a
+    small bounded queue; a client that falls behind has its backlog replaced
+    by a single `resync` event (it then refetches /state?since=<its version>)
+    so one slow console never holds memory or delays the others.
+    """
+    def __init__(self, maxsize: int = QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.subscribers: Set[Subscriber] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber(self.maxsize)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+
+    def publish(self, message: bytes, version: int):
+        """Thread-safe: may be called from the job completion thread."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._fanout, message, version)
+
+    def _fanout(self, message: bytes, version: int):
+        for sub in list(self.subscribers):
+            try:
+                sub.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                sub.dropped += 1
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(sse("resync", json.dumps({"version": version}).encode()))
+
+__all__ = ["Broadcaster", "Subscriber", "sse"]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+from typing import Any, Optional
+import gzip
+
+import numpy as np
+
+try:
+    import brotli  # optional: ~15-20% smaller than gzip on geometry payloads
+except Exception:
+    brotli = None
+
+# Compact state encoding: every GeoJSON geometry's "coordinates" becomes "q",
+# each ring/line a flat int list [x0, y0, dx1, dy1, ...] of coordinates scaled
+# by 10**PRECISION (~0.1 m at 6), and generated subzone polygons that repeat a
+# hazard feature's outer ring become "polygon_ref" (that feature's index).
+PRECISION = 6
+SCALE = 10 ** PRECISION
+ENCODING = {"name": "qdelta", "scale": SCALE}
+ENCODINGS = ("json", "compact")
+
+GEOMETRY_TYPES = {"Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon"}
+DEPTH = {"Point": 0, "MultiPoint": 1, "LineString": 1, "MultiLineString": 2, "Polygon": 2, "MultiPolygon": 3}
+MIN_COMPRESS = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def _line(coords) -> list:
+    a = np.rint(np.asarray(coords, dtype=float)[:, :2] * SCALE).astype(np.int64)
+    a[1:] -= a[:-1].copy()
+    return a.ravel().tolist()
+
+def _quantize(coords, depth: int):
+    if depth == 0:
+        return [int(round(c * SCALE)) for c in coords[:2]]
+    if depth == 1:
+        return _line(coords) if len(coords) else []
+    return [_quantize(c, depth - 1) for c in coords]
+
+def encode_geometry(g: dict) -> dict:
+    if g.get("type") == "GeometryCollection":
+        return {**g, "geometries": [encode_geometry(x) for x in g.get("geometries") or []]}
+    out = {k: v for k, v in g.items() if k != "coordinates"}
+    out["q"] = _quantize(g["coordinates"], DEPTH[g["type"]])
+    return out
+
+def _is_geometry(v: dict) -> bool:
+    return (v.get("type") in GEOMETRY_TYPES and "coordinates" in v) or v.get("type") == "GeometryCollection"
+
+def _walk(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        if _is_geometry(obj):
+            return encode_geometry(obj)
+        return {k: _walk(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_walk(v) for v in obj]
+    return obj
+
+def _dedupe_subzones(hazard: dict) -> dict:
+    # Generated subzone rings are repeated verbatim as hazard features
+    feats = ((hazard.get("geojson") or {}).get("features")) or []
+    ring_of = {}
+    for i, f in enumerate(feats):
+        g = f.get("geometry") or {}
+        zone = (f.get("properties") or {}).get("zone")
+        if zone is not None and g.get("type") == "Polygon" and g.get("coordinates"):
+            ring_of[zone] = (i, g["coordinates"][0])
+    zones = []
+    for gz in hazard.get("generated_zones") or []:
+        hit = ring_of.get(gz.get("id"))
+        poly = gz.get("polygon")
+        if hit is not None and poly is not None and np.array_equal(np.asarray(poly, dtype=float), np.asarray(hit[1], dtype=float)):
+            gz = {k: v for k, v in gz.items() if k != "polygon"}
+            gz["polygon_ref"] = hit[0]
+        elif poly:
+            gz = {k: v for k, v in gz.items() if k != "polygon"}
+            gz["polygon_q"] = _line(poly)
+        zones.append(gz)
+    return {**hazard, "generated_zones": zones}
+
+def encode_section(name: str, value: Any) -> Any:
+    """Compact form of one top-level state section (see web/src/lib/geocodec.ts)."""
+    if value is None:
+        return None
+    if name == "hazard" and isinstance(value, dict) and value.get("generated_zones"):
+        value = _dedupe_subzones(value)
+    return _walk(value)
+
+# ---------- Response compression ----------
+def pick_coding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported content-coding in an Accept-Encoding header (br > gzip)."""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    wild = offered.get("*", 0.0)
+    for coding in (("br",) if brotli is not None else ()) + ("gzip",):
+        if offered.get(coding, wild) > 0:
+            return coding
+    return None
+
+def compress(body: bytes, coding: Optional[str]) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+__all__ = ["ENCODING", "ENCODINGS", "PRECISION", "encode_section", "encode_geometry",
+           "pick_coding", "compress", "MIN_COMPRESS"]
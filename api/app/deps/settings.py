@@ -4,3 +4,20 @@ from dotenv import load_dotenv
 load_dotenv()
 SWARMS_API_KEY = os.getenv("SWARMS_API_KEY")
 
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "2"))
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "4"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "10"))
+QA_CONTEXT_TOKENS = int(os.getenv("QA_CONTEXT_TOKENS", "3000"))
+QA_CACHE_SIZE = int(os.getenv("QA_CACHE_SIZE", "256"))
+QA_CACHE_TTL = float(os.getenv("QA_CACHE_TTL", "600"))
+QA_BACKEND = os.getenv("QA_BACKEND", "auto")  # auto | http | callable | stub
+QA_MODEL_URL = os.getenv("QA_MODEL_URL", "")  # OpenAI-compatible /chat/completions endpoint
+QA_MODEL_KEY = os.getenv("QA_MODEL_KEY")
+QA_MODEL_NAME = os.getenv("QA_MODEL_NAME", "")
+QA_MAX_CONCURRENCY = int(os.getenv("QA_MAX_CONCURRENCY", "8"))
+QA_TIMEOUT = float(os.getenv("QA_TIMEOUT", "30"))
+QA_RETRIES = int(os.getenv("QA_RETRIES", "2"))
+QA_STUB_LATENCY_MS = float(os.getenv("QA_STUB_LATENCY_MS", "300"))
+QA_STUB_TOKENS_PER_S = float(os.getenv("QA_STUB_TOKENS_PER_S", "50"))
+SCENARIOS_HOT = int(os.getenv("SCENARIOS_HOT", "8"))
+ENSEMBLE_WORKERS = int(os.getenv("ENSEMBLE_WORKERS", "0"))  # 0: one per CPU
@@ -0,0 +1,219 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import multiprocessing as mp
+import threading
+import time
+import uuid
+
+from .orchestrator import run_pipeline
+from .telemetry import registry, init_tracing, flush_tracing
+
+MAX_JOBS_KEPT = 100
+MAX_ATTEMPTS = 2  # a job that lands on a pool broken by another worker's death is retried once
+
+def _run_job(job_id: str, scenario_path: str, prev: dict, progress) -> dict:
+    # Runs inside a pool worker: only picklable arguments cross the boundary.
+    def report(stage: str, done: int, total: int):
+        try:
+            progress[job_id] = {"stage": stage, "done": done, "total": total}
+        except Exception:
+            pass
+    # Pool workers run one job at a time: ship this job's samples back with the result
+    init_tracing()
+    registry.reset()
+    try:
+        out = run_pipeline(Path(scenario_path), prev, progress=report)
+    finally:
+        flush_tracing()
+    out["metrics"] = registry.dump()
+    return out
+
+class Job:
+    def __init__(self, job_id: str, key: str = "default"):
+        self.id = job_id
+        self.key = key
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.version: Optional[int] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self.attempts = 0
+        self.on_exit: Optional[Callable[[], Any]] = None
+
+class JobManager:
+    """
+    Runs `run_pipeline` in a process pool so the event loop keeps serving
+    /state and /qa while a plan is recomputed. Only the most recently
+    submitted job per key (scenario) may publish into its State; older jobs
+    for the same key are superseded. Results are published one at a time on
+    a dedicated thread, and a pool whose worker died is replaced.
+    """
+    def __init__(self, workers: int = 2):
+        self.workers = max(1, workers)
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.latest: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-publish")
+        self._manager = None
+        self._progress = None
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._manager is None:
+                self._manager = mp.Manager()
+                self._progress = self._manager.dict()
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        # A worker died (SIGKILL, OOM): the pool refuses all further work
+        with self._pool_lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        registry.inc("crisis_job_pool_restarts_total")
+
+    def _start(self, job: Job, scenario_path: Path, prev: dict, on_done: Callable[[dict], Any]):
+        job.attempts += 1
+        pool = self._ensure_pool()
+        try:
+            fut = pool.submit(_run_job, job.id, str(scenario_path), prev, self._progress)
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            pool = self._ensure_pool()
+            fut = pool.submit(_run_job, job.id, str(scenario_path), prev, self._progress)
+        job.future = fut
+        # Done callbacks run on the pool's management thread: hand off at once
+        fut.add_done_callback(lambda f: self._publisher.submit(self._finish, job, f, on_done, pool, scenario_path, prev))
+
+    def submit(self, scenario_path: Path, prev: dict, on_done: Callable[[dict], Any], key: str = "default",
+               on_exit: Optional[Callable[[], Any]] = None) -> Job:
+        """`on_exit` runs once the job has settled, whether or not it published."""
+        job = Job(uuid.uuid4().hex[:12], key)
+        job.on_exit = on_exit
+        with self.lock:
+            for old in self.jobs.values():
+                if old.key == key and old.status in ("queued", "running"):
+                    self._supersede(old)
+            self.jobs[job.id] = job
+            self.latest[key] = job.id
+            while len(self.jobs) > MAX_JOBS_KEPT:
+                self.jobs.popitem(last=False)
+        self._start(job, scenario_path, prev, on_done)
+        return job
+
+    def _supersede(self, job: Job):
+        # Queued jobs are dropped outright; running ones finish but are discarded.
+        if job.future is not None and job.future.cancel():
+            job.finished_at = time.time()
+        job.status = "superseded"
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return job
+            if job.future is not None:
+                job.future.cancel()
+            job.status = "cancelled"
+            if self.latest.get(job.key) == job_id:
+                self.latest.pop(job.key, None)
+            return job
+
+    def _finish(self, job: Job, fut: Future, on_done: Callable[[dict], Any], pool: ProcessPoolExecutor,
+                scenario_path: Path, prev: dict):
+        # Runs on the publisher thread, so results are published in completion order
+        if not fut.cancelled() and isinstance(fut.exception(), BrokenProcessPool):
+            self._replace_pool(pool)
+            with self.lock:
+                retry = job.attempts < MAX_ATTEMPTS and job.status in ("queued", "running")
+            if retry:
+                self._start(job, scenario_path, prev, on_done)
+                return
+        result = None
+        if not fut.cancelled() and fut.exception() is None:
+            result = fut.result()
+            # Work done by superseded jobs still counts towards the metrics
+            registry.merge(result.pop("metrics", None))
+        with self.lock:
+            job.finished_at = time.time()
+            publish = self._settle(job, fut)
+        if publish:
+            # on_done writes and snapshots the State: keep it outside the lock
+            try:
+                version = on_done(result)
+                status, error = "done", None
+            except Exception as e:
+                version, status, error = None, "failed", f"{type(e).__name__}: {e}"
+            with self.lock:
+                job.version, job.error = version, error
+                if job.status in ("queued", "running"):
+                    job.status = status
+        registry.inc("crisis_jobs_total", status=job.status)
+        self._drop_progress(job.id)
+        if job.on_exit is not None:
+            job.on_exit()
+
+    def _settle(self, job: Job, fut: Future) -> bool:
+        # Whether the result should be published; otherwise records why not
+        if fut.cancelled() or job.status in ("superseded", "cancelled"):
+            if job.status not in ("superseded", "cancelled"):
+                job.status = "cancelled"
+            return False
+        err = fut.exception()
+        if err is not None:
+            job.status = "failed"
+            job.error = f"{type(err).__name__}: {err}"
+            return False
+        if self.latest.get(job.key) != job.id:
+            job.status = "superseded"
+            return False
+        job.status = "running"
+        return True
+
+    def _drop_progress(self, job_id: str):
+        try:
+            self._progress.pop(job_id, None)
+        except Exception:
+            pass
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def describe(self, job: Job) -> Dict[str, Any]:
+        progress = None
+        if job.status in ("queued", "running"):
+            try:
+                progress = self._progress.get(job.id)
+            except Exception:
+                progress = None
+        with self.lock:
+            if progress and job.status == "queued":
+                job.status = "running"
+            return {
+                "id": job.id,
+                "scenario": job.key,
+                "status": job.status,
+                "progress": progress,
+                "version": job.version,
+                "error": job.error,
+                "submittedAt": job.submitted_at,
+                "finishedAt": job.finished_at,
+            }
+
+    def shutdown(self):
+        self._publisher.shutdown(wait=False, cancel_futures=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
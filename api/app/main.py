@@ -1,10 +1,23 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from pathlib import Path
-from .orchestrator import run_pipeline
+import asyncio
+import json
+import time
+from .jobs import JobManager
+from .broadcast import Broadcaster, sse
 from .state import State
-from .services.qa import answer
+from .persistence import SnapshotStore
+from .workspace import Workspace, Scenario
+from .codec import ENCODINGS, MIN_COMPRESS, pick_coding
+from .tiles import TileCache, MEDIA_TYPES, parse_tile, mapbox_vector_tile
+from .deps.settings import PIPELINE_WORKERS, SNAPSHOT_KEEP, SCENARIOS_HOT
+from .services.qa import DEFAULT_SCOPE, answer, answer_stream, close as close_qa, invalidate as invalidate_qa, stats as qa_stats, warm as warm_qa
+from .services.model_client import ModelError
+from .telemetry import registry, init_tracing
 
 app = FastAPI()
 
@@ -20,11 +33,48 @@ app.add_middleware(
 # Persistent state
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
-state = State(DATA_DIR)
+store = SnapshotStore(DATA_DIR, keep=SNAPSHOT_KEEP)
+state = State(DATA_DIR, store=store)
+state.restore()
+jobs = JobManager(workers=PIPELINE_WORKERS)
+broadcaster = Broadcaster()
+KEEPALIVE_S = 15
+
+# Latency of the API routes; /stream and /metrics are long-lived or self-referential
+UNTIMED = {"/stream", "/metrics"}
+
+@app.middleware("http")
+async def _timed(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "other"  # route template keeps label cardinality bounded
+        if path not in UNTIMED:
+            registry.observe("crisis_http_request_seconds", time.perf_counter() - t0,
+                             method=request.method, path=path, status=status)
+
+def _publish_state(version: int):
+    # One delta per version, shared by every connected client
+    broadcaster.publish(sse("state", state.delta(version - 1)), version)
+
+state.on_change(_publish_state)
+state.on_change(invalidate_qa)
+
+def _scenario_loaded(sc: Scenario):
+    sc.state.on_change(lambda version, sid=sc.id: invalidate_qa(version, scope=sid))
+
+# Scenario-scoped incidents/drills under data/scenarios/<id>; the routes above stay the default one
+workspace = Workspace(DATA_DIR / "scenarios", max_hot=SCENARIOS_HOT, keep=SNAPSHOT_KEEP, on_load=_scenario_loaded)
 
 # ---------- Models ----------
 class StateOut(BaseModel):
     hazard: dict | None
+    inundation: dict | None = None
     demand: dict | None
     transport: dict | None
     shelter: dict | None
@@ -33,6 +83,7 @@ class StateOut(BaseModel):
     comms: dict | None
     plan: dict | None
     event: dict | None
+    timings: dict | None = None
     version: int
     updatedAt: str | None
 
@@ -49,16 +100,195 @@ async def upload(file: UploadFile = File(...)):
     scenario_path = DATA_DIR / "scenario.json"
     scenario_path.write_bytes(raw)
 
-    outputs = run_pipeline(scenario_path, DATA_DIR, prev=state.snapshot())
-    state.set_all(outputs)
-    return {"ok": True, "version": state.version}
+    # Pipeline runs in a worker process; the newest job supersedes older ones.
+    job = jobs.submit(scenario_path, prev=state.snapshot(), on_done=state.set_all)
+    return {"ok": True, "job": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return jobs.describe(job)
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return jobs.describe(job)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+    return etag in tags or "*" in tags
+
+def _state_response(st: State, request: Request, since: int | None, encoding: str = "json") -> Response:
+    # Bodies are pre-serialized (and compressed) once per version; unchanged polls cost a 304
+    if encoding not in ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"encoding must be one of {', '.join(ENCODINGS)}")
+    coding = pick_coding(request.headers.get("accept-encoding"))
+    version, body, coding = st.view(encoding, coding, since, MIN_COMPRESS)
+    tag = f'"{st.epoch}-{version}' + ("-compact" if encoding == "compact" else "")
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+        tag += f"-{coding}"
+    headers["ETag"] = etag = tag + '"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.get("/state", response_model=StateOut)
-def get_state():
-    return state.snapshot()
+def get_state(request: Request, since: int | None = None, encoding: str = "json"):
+    """`encoding=compact` quantizes geometries to integer deltas (decode with web/src/lib/geocodec.ts)."""
+    return _state_response(state, request, since, encoding)
 
-@app.post("/qa", response_model=QAOut)
-async def qa_endpoint(in_: QAIn):
+@app.get("/stream")
+async def stream(request: Request):
+    """
+    Server-sent events: `state` events carry the sections changed by each
+    new version (same shape as /state?since=); `resync` asks the client to
+    refetch /state?since=<its version> after it fell behind.
+    """
+    sub = broadcaster.subscribe()
+
+    async def events():
+        try:
+            yield sse("hello", json.dumps({"version": state.version}).encode())
+            while not await request.is_disconnected():
+                try:
+                    msg = await asyncio.wait_for(sub.queue.get(), timeout=KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield msg
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _qa(query: str, st: State, scope: str = DEFAULT_SCOPE) -> QAOut:
     # Pass snapshot (dict) instead of State object
-    ans = answer(in_.query, state.snapshot())
+    try:
+        ans = await answer(query, st.snapshot(), scope)
+    except ModelError as e:
+        raise HTTPException(502, f"QA model failed: {e}")
     return QAOut(answer=ans)
+
+def _qa_stream(query: str, st: State, scope: str = DEFAULT_SCOPE) -> StreamingResponse:
+    snap = st.snapshot()
+
+    async def tokens():
+        try:
+            async for tok in answer_stream(query, snap, scope):
+                yield tok.encode()
+        except ModelError as e:
+            yield f"\n[QA model failed: {e}]".encode()
+
+    return StreamingResponse(tokens(), media_type="text/plain; charset=utf-8",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/qa", response_model=QAOut)
+async def qa_endpoint(in_: QAIn):
+    return await _qa(in_.query, state)
+
+@app.post("/qa/stream")
+async def qa_stream(in_: QAIn):
+    return _qa_stream(in_.query, state)
+
+tile_cache = TileCache()
+
+def _tile_response(st: State, scope: str, request: Request, layer: str, z: int, x: int, y: str) -> Response:
+    try:
+        row, fmt = parse_tile(layer, z, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt == "mvt" and mapbox_vector_tile is None:
+        raise HTTPException(status_code=501, detail="MVT needs mapbox-vector-tile installed; request .geojson")
+    snap = st.snapshot()
+    etag = f'"{st.epoch}-{snap["version"]}-{layer}-{z}-{x}-{row}-{fmt}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    body = tile_cache.tile((scope, st.epoch, snap["version"]), snap, layer, z, x, row, fmt)
+    return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+@app.get("/tiles/{layer}/{z}/{x}/{y}")
+def get_tile(layer: str, z: int, x: int, y: str, request: Request):
+    """Per-zoom simplified, tile-clipped geometry: y may end in .mvt/.pbf or .geojson."""
+    return _tile_response(state, DEFAULT_SCOPE, request, layer, z, x, y)
+
+# ---------- Scenario-scoped routes ----------
+def _scenario(sid: str) -> Scenario:
+    if not workspace.valid(sid):
+        raise HTTPException(status_code=400, detail="scenario id must match [A-Za-z0-9_-]{1,64}")
+    sc = workspace.get(sid)
+    if sc is None:
+        raise HTTPException(status_code=404, detail="scenario not found")
+    return sc
+
+@app.get("/scenarios")
+def list_scenarios():
+    return {"scenarios": [workspace.describe(sid) for sid in workspace.ids()]}
+
+def _submit_scenario(sid: str, raw: bytes):
+    # Pinned until the job settles so eviction cannot close the store it publishes into
+    sc = workspace.pin(sid, create=True)
+    try:
+        sc.scenario_path.write_bytes(raw)
+        return jobs.submit(sc.scenario_path, prev=sc.state.snapshot(), on_done=sc.state.set_all,
+                           key=sid, on_exit=lambda: workspace.unpin(sid))
+    except Exception:
+        workspace.unpin(sid)
+        raise
+
+@app.post("/scenarios/{sid}/upload")
+async def upload_scenario(sid: str, file: UploadFile = File(...)):
+    if not workspace.valid(sid):
+        raise HTTPException(status_code=400, detail="scenario id must match [A-Za-z0-9_-]{1,64}")
+    raw = await file.read()
+    # Loading, restoring and evicting scenarios block: keep them off the event loop
+    job = await run_in_threadpool(_submit_scenario, sid, raw)
+    return {"ok": True, "scenario": sid, "job": job.id, "status": job.status}
+
+@app.get("/scenarios/{sid}/state", response_model=StateOut)
+def get_scenario_state(sid: str, request: Request, since: int | None = None, encoding: str = "json"):
+    return _state_response(_scenario(sid).state, request, since, encoding)
+
+@app.post("/scenarios/{sid}/qa", response_model=QAOut)
+async def scenario_qa(sid: str, in_: QAIn):
+    sc = await run_in_threadpool(_scenario, sid)
+    return await _qa(in_.query, sc.state, sid)
+
+@app.get("/scenarios/{sid}/tiles/{layer}/{z}/{x}/{y}")
+def get_scenario_tile(sid: str, layer: str, z: int, x: int, y: str, request: Request):
+    return _tile_response(_scenario(sid).state, sid, request, layer, z, x, y)
+
+@app.post("/scenarios/{sid}/qa/stream")
+def scenario_qa_stream(sid: str, in_: QAIn):
+    return _qa_stream(in_.query, _scenario(sid).state, sid)
+
+@app.get("/qa/stats")
+def qa_stats_endpoint():
+    return qa_stats()
+
+@app.get("/metrics")
+def metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.on_event("startup")
+async def _startup():
+    broadcaster.bind(asyncio.get_running_loop())
+    init_tracing()
+    warm_qa()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    jobs.shutdown()
+    store.close()
+    workspace.close()
+    await close_qa()
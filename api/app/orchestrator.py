@@ -1,73 +1,123 @@
 from pathlib import Path
 import json
+import time
 from datetime import datetime, timedelta, timezone
 
 from .swarms.agents.land import land_agent
 from .swarms.agents.hazard import hazard_agent
+from .swarms.agents.inundation import inundation_agent
 from .swarms.agents.demand import demand_agent
 from .swarms.agents.transport import transport_agent
 from .swarms.agents.shelter import shelter_agent
 from .swarms.agents.resources import resources_agent
 from .swarms.agents.equity import equity_agent
 from .swarms.agents.comm import comms_agent
+from .swarms.agents.raster import DATA_DIR
+from .scheduler import Stage, run_stages
+from .deps.settings import STAGE_WORKERS
 
-def impact_time_agent(scenario, hazard, prev):
-    cut = (hazard or {}).get("cutoffs") or {}
+def _cutoffs(hazard, inundation):
+    # Simulated arrival times replace the authored cutoffs of the zones the flood reaches
+    return {**((hazard or {}).get("cutoffs") or {}), **((inundation or {}).get("cutoffs") or {})}
+
+def impact_time_agent(scenario, hazard, inundation, prev):
+    cut = _cutoffs(hazard, inundation)
     if cut:
         eta = max(10, min(cut.values()))
     else:
         eta = int((scenario.get("event") or {}).get("eta_min", 120))
     return {"eta_min": eta}
 
-def run_pipeline(scenario_path: Path, out_dir: Path, prev: dict):
-    scenario = json.loads(scenario_path.read_text())
+def plan_agent(scenario, transport, resources, equity, prev):
+    return {
+        "version": (prev or {}).get("version", 0) + 1,
+        "assignments": transport.get("assignments", []),
+        "coverage": resources.get("coverage", 0.0),
+        "fairnessIndex": equity.get("fairnessIndex", 1.0),
+        "riskMarginMin": transport.get("riskMarginMin", 0),
+        "unmetDemand": resources.get("unmetDemand", 0),
+    }
 
-    land = land_agent(scenario, prev.get("land"))  # <-- NEW
+def _hazard_stage(scenario, land, prev):
     # Inject land mask into scenario so hazard clips to coastline instead of rectangles
     if land and land.get("geojson"):
-        scenario["land_mask"] = land["geojson"]
+        scenario = {**scenario, "land_mask": land["geojson"]}
+    return hazard_agent(scenario, prev)
+
+def _transport_stage(scenario, hazard, demand, inundation, prev):
+    if (inundation or {}).get("cutoffs"):
+        hazard = {**hazard, "cutoffs": _cutoffs(hazard, inundation)}
+    return transport_agent(scenario, hazard, demand, prev)
 
-    hazard = hazard_agent(scenario, prev.get("hazard"))  # uses scenario["land_mask"] if present :contentReference[oaicite:0]{index=0}:contentReference[oaicite:1]{index=1}
-    demand = demand_agent(scenario, hazard, prev.get("demand"))  # :contentReference[oaicite:2]{index=2}
-    transport = transport_agent(scenario, hazard, demand, prev.get("transport"))  # :contentReference[oaicite:3]{index=3}
-    shelter = shelter_agent(scenario, hazard, prev.get("shelter"))  # :contentReference[oaicite:4]{index=4}
-    resources = resources_agent(scenario, demand, transport, shelter, prev.get("resources"))  # :contentReference[oaicite:5]{index=5}
-    equity = equity_agent(scenario, demand, transport, shelter, resources, prev.get("equity"))  # :contentReference[oaicite:6]{index=6}
+def _files(*grids, roads=False, land=False):
+    # Files an agent reads from disk: `grids` are {path, ...} scenario fields
+    def files(scenario):
+        out = []
+        for key in grids:
+            conf = scenario.get(key)
+            if isinstance(conf, dict) and conf.get("path"):
+                out.append(DATA_DIR / conf["path"])  # an absolute path replaces DATA_DIR
+        r = scenario.get("roads")
+        if roads and not (isinstance(r, dict) and r.get("features")):
+            out.append(DATA_DIR / (r if isinstance(r, str) else "roads.geojson"))
+        if land:
+            out.append(DATA_DIR / "ne_50m_land.geojson")
+        return out
+    return files
 
-    it = impact_time_agent(scenario, hazard, prev.get("impact_time"))
-    eta_min = it["eta_min"]
+# Each agent declares the upstream outputs it consumes; independent agents
+# (e.g. demand / shelter / impact_time after hazard) run concurrently.
+# `keys` are the scenario fields each agent reads: unchanged inputs reuse the
+# previous output, so e.g. editing only assets.buses skips hazard entirely.
+# `files` adds the version of the grids and geojson an agent reads from disk.
+STAGES = [
+    Stage("land", land_agent, keys=["location", "land_mask"]),
+    Stage("hazard", _hazard_stage, ["land"], keys=["impact_seed", "location", "zones", "auto_subzones", "defaults", "population_grid"],
+          files=_files("population_grid", land=True)),
+    Stage("inundation", inundation_agent, ["land", "hazard"], keys=["inundation", "elevation_grid", "impact_seed", "location", "zones", "event"],
+          files=_files("elevation_grid", land=True)),
+    Stage("demand", demand_agent, ["hazard"], keys=["zones", "population_grid"], files=_files("population_grid")),
+    Stage("shelter", shelter_agent, ["hazard"], keys=["shelters"]),
+    Stage("impact_time", impact_time_agent, ["hazard", "inundation"], keys=["event"]),
+    Stage("transport", _transport_stage, ["hazard", "demand", "inundation"], keys=["zones", "auto_subzones", "shelters", "roads", "routing", "assignment"],
+          files=_files(roads=True)),
+    Stage("resources", resources_agent, ["demand", "transport", "shelter"], keys=["assets"]),
+    Stage("equity", equity_agent, ["demand", "transport", "shelter", "resources"], keys=[]),
+    Stage("plan", plan_agent, ["transport", "resources", "equity"]),  # new version every run
+    Stage("comms", comms_agent, ["plan"]),
+]
+
+def run_pipeline(scenario_path: Path, prev: dict, progress=None):
+    scenario = json.loads(scenario_path.read_text())
+
+    t0 = time.perf_counter()
+    res, timings, hashes, reused = run_stages(STAGES, scenario, prev, max_workers=STAGE_WORKERS, progress=progress)
+    timings["total"] = round((time.perf_counter() - t0) * 1000.0, 3)
+
+    eta_min = res["impact_time"]["eta_min"]
     ev_type = (scenario.get("event") or {}).get("type", "tsunami")
     loc_name = (scenario.get("location") or {}).get("name")
     impact_at = (datetime.now(timezone.utc) + timedelta(minutes=eta_min)).isoformat()
-
-    plan = {
-        "version": (prev.get("version") or 0) + 1,
-        "assignments": transport.get("assignments", []),
-        "coverage": resources.get("coverage", 0.0),
-        "fairnessIndex": equity.get("fairnessIndex", 1.0),
-        "riskMarginMin": transport.get("riskMarginMin", 0),
-        "unmetDemand": resources.get("unmetDemand", 0),
-    }
-    comms = comms_agent(scenario, plan, prev.get("comms"))  # :contentReference[oaicite:7]{index=7}
     event = {"type": ev_type, "etaMin": eta_min, "impactAt": impact_at, "locationName": loc_name}
 
     outputs = {
-        "land": land,  # <-- NEW (so frontend could visualize/debug if desired)
-        "hazard": hazard,
-        "demand": demand,
-        "transport": transport,
-        "shelter": shelter,
-        "resources": resources,
-        "equity": equity,
-        "comms": comms,
-        "plan": plan,
+        "land": res["land"],  # so frontend could visualize/debug if desired
+        "hazard": res["hazard"],
+        "inundation": res["inundation"],
+        "demand": res["demand"],
+        "transport": res["transport"],
+        "shelter": res["shelter"],
+        "resources": res["resources"],
+        "equity": res["equity"],
+        "comms": res["comms"],
+        "plan": res["plan"],
         "event": event,
-        "impact_time": it,
-        "version": plan["version"],
+        "impact_time": res["impact_time"],
+        "timings": timings,
+        "hashes": hashes,
+        "scenario": scenario,  # what this version was computed from (QA context)
+        "reused": reused,
+        "version": res["plan"]["version"],
         "updatedAt": impact_at,
     }
-
-    out_dir.mkdir(parents=True, exist_ok=True)
-    for k, v in outputs.items():
-        (out_dir / f"{k}.json").write_text(json.dumps(v))
     return outputs
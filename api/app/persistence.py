@@ -0,0 +1,111 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Optional
+import gzip
+import json
+import os
+import re
+import tempfile
+
+from .telemetry import span
+
+try:
+    import zstandard  # optional: faster and smaller than gzip
+except Exception:
+    zstandard = None
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+_NAME = re.compile(r"^state-(\d+)\.json\.(zst|gz)$")
+
+def _compress(raw: bytes):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(raw), "zst"
+    return gzip.compress(raw, compresslevel=5), "gz"
+
+def _decompress(blob: bytes, ext: str) -> bytes:
+    if ext == "zst":
+        if zstandard is None:
+            raise RuntimeError("snapshot is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+def _loads(raw: bytes):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+class SnapshotStore:
+    """
+    One compressed JSON snapshot per state version under <root>/snapshots,
+    written atomically (temp file + rename) by a single background thread so
+    uploads never wait on disk and writes land in version order. Only the
+    newest `keep` versions are retained; snapshots newer than the restored
+    one that could not be read (e.g. .zst without zstandard) are never pruned.
+    """
+    def __init__(self, root: Path, keep: int = 10):
+        self.dir = root / "snapshots"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.keep = max(1, keep)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+        self.newest = 0       # highest version on disk at restore, readable or not
+        self.skipped = set()  # unreadable snapshots load_latest passed over
+
+    def _versions(self):
+        out = []
+        for p in self.dir.iterdir():
+            m = _NAME.match(p.name)
+            if m:
+                out.append((int(m.group(1)), m.group(2), p))
+        return sorted(out)
+
+    def _write(self, version: int, raw: bytes) -> Path:
+        with span("snapshot.write"):
+            return self._write_atomic(version, raw)
+
+    def _write_atomic(self, version: int, raw: bytes) -> Path:
+        blob, ext = _compress(raw)
+        target = self.dir / f"state-{version:08d}.json.{ext}"
+        fd, tmp = tempfile.mkstemp(dir=self.dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        kept = [p for _, _, p in self._versions() if p not in self.skipped]
+        for p in kept[:-self.keep]:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+        return target
+
+    def save(self, version: int, raw: bytes) -> Future:
+        """Queue `raw` (serialized snapshot JSON) to be persisted as `version`."""
+        return self._writer.submit(self._write, version, raw)
+
+    def load_latest(self) -> Optional[dict]:
+        versions = self._versions()
+        self.newest = versions[-1][0] if versions else 0
+        for version, ext, p in reversed(versions):
+            try:
+                return _loads(_decompress(p.read_bytes(), ext))
+            except Exception:
+                # Torn/corrupt or undecodable here: fall back to the previous
+                # version, but leave this one on disk
+                self.skipped.add(p)
+        return None
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+__all__ = ["SnapshotStore"]
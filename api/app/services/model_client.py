@@ -0,0 +1,180 @@
+from __future__ import annotations
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import json
+import random
+
+try:
+    import httpx  # optional: pooled async HTTP backend
+except Exception:
+    httpx = None
+
+class ModelError(RuntimeError):
+    pass
+
+class ModelClient:
+    """
+    Async model backend. Subclasses implement `_complete` / `_stream`; this
+    base adds the shared concurrency cap, per-call timeout and retries with
+    jittered backoff so one slow call never blocks the event loop.
+    """
+    name = "base"
+
+    def __init__(self, max_concurrency: int = 8, timeout: float = 30.0, retries: int = 2):
+        self.sem = asyncio.Semaphore(max(1, max_concurrency))
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.calls = self.failures = self.retried = 0
+
+    async def _complete(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        yield await self._complete(prompt)
+
+    async def _backoff(self, attempt: int):
+        self.retried += 1
+        await asyncio.sleep(min(0.25 * 2 ** attempt, 4.0) * (0.5 + random.random()))
+
+    async def complete(self, prompt: str) -> str:
+        async with self.sem:
+            self.calls += 1
+            for attempt in range(self.retries + 1):
+                try:
+                    return await asyncio.wait_for(self._complete(prompt), self.timeout)
+                except Exception as e:
+                    if attempt == self.retries or not _transient(e):
+                        self.failures += 1
+                        raise ModelError(f"{type(e).__name__}: {e}") from e
+                await self._backoff(attempt)
+        raise ModelError("unreachable")
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # Retries only before the first token: a partial answer is never replayed.
+        async with self.sem:
+            self.calls += 1
+            for attempt in range(self.retries + 1):
+                sent = False
+                try:
+                    it = self._stream(prompt).__aiter__()
+                    while True:
+                        try:
+                            tok = await asyncio.wait_for(it.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            return
+                        sent = True
+                        yield tok
+                except Exception as e:
+                    if sent or attempt == self.retries or not _transient(e):
+                        self.failures += 1
+                        raise ModelError(f"{type(e).__name__}: {e}") from e
+                await self._backoff(attempt)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "calls": self.calls, "failures": self.failures, "retried": self.retried}
+
+    async def aclose(self):
+        pass
+
+def _transient(e: BaseException) -> bool:
+    if isinstance(e, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if httpx is not None:
+        if isinstance(e, httpx.TransportError):
+            return True
+        if isinstance(e, httpx.HTTPStatusError):
+            return e.response.status_code == 429 or e.response.status_code >= 500
+    return False
+
+def _text(res: Any) -> str:
+    if isinstance(res, dict):
+        return (res.get("content") or res.get("text") or res.get("answer") or "").strip()
+    if isinstance(res, str):
+        return res.strip()
+    return "No text returned from model_request."
+
+class CallableClient(ModelClient):
+    """Wraps a blocking `model_request(role, content)` in a worker thread."""
+    name = "callable"
+
+    def __init__(self, fn: Callable[..., Any], **kw):
+        super().__init__(**kw)
+        self.fn = fn
+
+    async def _complete(self, prompt: str) -> str:
+        return _text(await asyncio.to_thread(self.fn, role="user", content=prompt))
+
+class HTTPClient(ModelClient):
+    """OpenAI-compatible /chat/completions over one pooled httpx.AsyncClient."""
+    name = "http"
+
+    def __init__(self, url: str, api_key: Optional[str] = None, model: str = "", pool: int = 16, **kw):
+        if httpx is None:
+            raise ModelError("QA_BACKEND=http needs httpx installed")
+        super().__init__(**kw)
+        self.url = url
+        self.model = model
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+            limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+        )
+
+    def _body(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"messages": [{"role": "user", "content": prompt}], "stream": stream}
+        if self.model:
+            body["model"] = self.model
+        return body
+
+    async def _complete(self, prompt: str) -> str:
+        r = await self.client.post(self.url, json=self._body(prompt, False))
+        r.raise_for_status()
+        return (r.json()["choices"][0]["message"].get("content") or "").strip()
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        async with self.client.stream("POST", self.url, json=self._body(prompt, True)) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                delta = json.loads(data)["choices"][0].get("delta") or {}
+                if delta.get("content"):
+                    yield delta["content"]
+
+    async def aclose(self):
+        await self.client.aclose()
+
+class StubClient(ModelClient):
+    """
+    Offline backend for benchmarks: waits `latency_ms` to the first token,
+    then emits a deterministic answer at `tokens_per_s`.
+    """
+    name = "stub"
+
+    def __init__(self, latency_ms: float = 300.0, tokens_per_s: float = 50.0, **kw):
+        super().__init__(**kw)
+        self.latency = latency_ms / 1000.0
+        self.gap = 1.0 / tokens_per_s if tokens_per_s > 0 else 0.0
+
+    def _words(self, prompt: str) -> List[str]:
+        q = prompt.rsplit("User question:\n", 1)[-1].strip()
+        facts = prompt.count("\n")
+        return f"(stub) Answer to: {q} — grounded in {facts} context lines.".split(" ")
+
+    async def _complete(self, prompt: str) -> str:
+        words = self._words(prompt)
+        await asyncio.sleep(self.latency + self.gap * len(words))
+        return " ".join(words)
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        for i, w in enumerate(self._words(prompt)):
+            if i and self.gap:
+                await asyncio.sleep(self.gap)
+            yield w if i == 0 else " " + w
+
+__all__ = ["ModelClient", "ModelError", "CallableClient", "HTTPClient", "StubClient"]
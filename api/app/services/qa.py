@@ -1,18 +1,77 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional, Callable
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Callable, Tuple
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
 from pathlib import Path
 import json
+import asyncio
 import importlib
+import math
+import re
+import threading
+import time
+
+from ..state import PUBLIC_SECTIONS
+from ..deps.settings import (
+    QA_CONTEXT_TOKENS, QA_CACHE_SIZE, QA_CACHE_TTL, QA_BACKEND, QA_MODEL_URL, QA_MODEL_KEY, QA_MODEL_NAME,
+    QA_MAX_CONCURRENCY, QA_TIMEOUT, QA_RETRIES, QA_STUB_LATENCY_MS, QA_STUB_TOKENS_PER_S,
+)
+from .model_client import ModelClient, CallableClient, HTTPClient, StubClient, httpx
 
 DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+DEFAULT_SCOPE = ""  # the legacy single-scenario routes; others live under data/scenarios/<id>
+
+# Fields holding coordinate arrays: summarized, never flattened into the prompt
+GEOMETRY_KEYS = {"coordinates", "polygon", "geometry"}
+# Scalar facts at most this deep (e.g. plan.coverage) are always included
+PINNED_DEPTH = 2
+PINNED_MAX = 80
+RECORD_CHARS = 400
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP = {"the", "a", "an", "is", "are", "of", "to", "in", "for", "from", "what", "which", "how",
+         "many", "much", "do", "i", "we", "me", "my", "need", "and", "or", "on", "at", "by", "with",
+         "it", "this", "that", "be", "can", "there", "s", "whats", "why"}
+
+def _summarize_geometry(v: Any) -> str:
+    if isinstance(v, dict):
+        return f"<{v.get('type', 'geometry')}>"
+    n = 0
+    stack = [v]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, (list, tuple)) and x and isinstance(x[0], (int, float)):
+            n += 1
+        elif isinstance(x, (list, tuple)):
+            stack.extend(x)
+    return f"<{n} coordinates>"
+
+def _strip_geometry(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: (_summarize_geometry(v) if k in GEOMETRY_KEYS and v is not None else _strip_geometry(v))
+                for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_strip_geometry(v) for v in obj]
+    return obj
 
 def _flatten(obj: Any, prefix: str = "") -> List[str]:
     out: List[str] = []
+    if isinstance(obj, dict) and prefix.endswith("]"):
+        # One zone / assignment / route: kept together as a single fact when small
+        rec = json.dumps(_strip_geometry(obj), separators=(",", ":"), default=str)
+        if len(rec) <= RECORD_CHARS:
+            out.append(f"{prefix} = {rec}")
+            return out
     if isinstance(obj, dict):
         for k, v in obj.items():
             key = f"{prefix}.{k}" if prefix else str(k)
-            out.extend(_flatten(v, key))
+            if k in GEOMETRY_KEYS and v is not None:
+                out.append(f"{key} = {_summarize_geometry(v)}")
+            else:
+                out.extend(_flatten(v, key))
     elif isinstance(obj, list):
+        if obj and len(obj) <= 4 and all(isinstance(v, (int, float)) for v in obj):
+            out.append(f"{prefix} = {obj}")  # e.g. a centroid, kept as one fact
+            return out
         for i, v in enumerate(obj):
             key = f"{prefix}[{i}]"
             out.extend(_flatten(v, key))
@@ -20,15 +79,319 @@ def _flatten(obj: Any, prefix: str = "") -> List[str]:
         out.append(f"{prefix} = {obj}")
     return out
 
-def _load_all_json() -> Dict[str, Any]:
-    data: Dict[str, Any] = {}
-    for p in DATA_DIR.glob("*.json"):
+def _terms(text: str) -> List[str]:
+    return [t for t in _WORD.findall(text.lower()) if t not in _STOP]
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+class QAContext:
+    """
+    Searchable key=value facts for one state version. Built once per
+    version; each question then gets the pinned summary facts plus the
+    best-matching facts (idf-weighted term overlap) within a token budget.
+    """
+    def __init__(self, state: Dict[str, Any], scenario: Optional[Dict[str, Any]] = None):
+        self.version = state.get("version")
+        facts: List[str] = []
+        for k in PUBLIC_SECTIONS:
+            if state.get(k) is not None:
+                facts.extend(_flatten(state[k], k))
+        if scenario:
+            facts.extend(_flatten(scenario, "scenario"))
+        self.facts = facts
+        keys = [f.split(" = ", 1)[0] for f in facts]
+        self.pinned = [i for i, k in enumerate(keys) if k.count(".") < PINNED_DEPTH and "[" not in k][:PINNED_MAX]
+        self.index: Dict[str, List[int]] = defaultdict(list)
+        for i, f in enumerate(facts):
+            for t in set(_terms(f)):
+                self.index[t].append(i)
+        n = max(len(facts), 1)
+        self.idf = {t: math.log(1 + n / len(ids)) for t, ids in self.index.items()}
+
+    def select(self, query: str, budget_tokens: int) -> List[str]:
+        scores: Dict[int, float] = defaultdict(float)
+        for t in set(_terms(query)):
+            for i in self.index.get(t, ()):
+                scores[i] += self.idf[t]
+        chosen: List[int] = []
+        used = 0
+        ranked = list(self.pinned) + [i for i, _ in sorted(scores.items(), key=lambda x: (-x[1], x[0]))]
+        seen = set()
+        for i in ranked:
+            if i in seen:
+                continue
+            seen.add(i)
+            cost = _tokens(self.facts[i])
+            if used + cost > budget_tokens:
+                if i in self.pinned:
+                    continue
+                break
+            chosen.append(i)
+            used += cost
+        return [self.facts[i] for i in sorted(chosen)]
+
+def _norm(s: str) -> str:
+    return " ".join(_WORD.findall(str(s).lower()))
+
+def _num(v: Any) -> float:
+    try:
+        x = float(v)
+    except (TypeError, ValueError):
+        return 0.0
+    return x if math.isfinite(x) else 0.0
+
+class Aggregates:
+    """Per-version answers to the common operator questions (no model call)."""
+    def __init__(self, state: Dict[str, Any]):
+        self.version = state.get("version")
+        hazard = state.get("hazard") or {}
+        demand = state.get("demand") or {}
+        transport = state.get("transport") or {}
+        shelter = state.get("shelter") or {}
+
+        zones: Dict[str, Dict[str, Any]] = {}
+        for f in (hazard.get("geojson") or {}).get("features", []):
+            p = f.get("properties") or {}
+            zid = p.get("zone") or p.get("id")
+            if zid:
+                zones[str(zid)] = {"id": str(zid), "name": p.get("name") or str(zid), "people": 0, "risk": _num(p.get("severity"))}
+        for zid, z in (demand.get("by_zone") or {}).items():
+            zones.setdefault(str(zid), {"id": str(zid), "name": str(zid), "risk": 0.0})["people"] = int(_num(z.get("impacted")))
+        for g in hazard.get("generated_zones") or []:
+            zones[str(g["id"])] = {"id": str(g["id"]), "name": g.get("name") or str(g["id"]),
+                                   "people": int(_num(g.get("population"))), "risk": _num(g.get("risk"))}
+        # Ensemble runs: rank by expected risk (risk x probability of impact)
+        for zid, v in (hazard.get("impact_by_zone") or {}).items():
+            if str(zid) in zones and "p_impact" in v:
+                zones[str(zid)]["risk"] = round(zones[str(zid)]["risk"] * _num(v["p_impact"]), 3)
+        moved: Dict[str, int] = defaultdict(int)
+        for a in transport.get("assignments") or []:
+            moved[str(a.get("zone"))] += int(_num(a.get("people")))
+        for zid, n in moved.items():
+            if zid in zones and n:
+                zones[zid]["people"] = n
+
+        self.zones = zones
+        self.by_key = {}
+        for z in zones.values():
+            self.by_key.setdefault(_norm(z["name"]), z)
+            self.by_key[_norm(z["id"])] = z
+        self.priority = sorted((z for z in zones.values() if z["people"] > 0),
+                               key=lambda z: (-z["risk"], -z["people"]))
+        rm = transport.get("riskMarginMin")
+        self.risk_margin = rm if isinstance(rm, (int, float)) else None
+        ip = hazard.get("impact_population_total")
+        self.impact_population = int(ip) if isinstance(ip, (int, float)) else None
+        cap = 0.0
+        for f in (shelter.get("geojson") or {}).get("features", []):
+            p = f.get("properties") or {}
+            cap += _num(p.get("capacity", p.get("cap")))
+        self.shelter_capacity = int(cap)
+
+    def zone(self, words: str) -> Optional[Dict[str, Any]]:
+        parts = words.split()
+        for n in range(len(parts), 0, -1):  # longest prefix first: "outer sunset please" -> "outer sunset"
+            z = self.by_key.get(" ".join(parts[:n]))
+            if z is not None:
+                return z
+        return None
+
+def _zone_people(agg: Aggregates, q: str) -> Optional[str]:
+    for m in re.finditer(r"\b(?:zone|from|in)\s+(?=([a-z0-9 ]+))", q):
+        z = agg.zone(m.group(1))
+        if z is not None:
+            return f"Estimated evacuees in {z['name']}: {z['people']:,}"
+    return None
+
+def _priority(agg: Aggregates, q: str) -> Optional[str]:
+    if not agg.priority:
+        return None
+    m = re.search(r"top\s+(\d+)", q)
+    n = max(1, min(int(m.group(1)) if m else 3, 20))
+    lines = [f"{i + 1}. {z['name']} ({z['people']:,}, risk {z['risk']:g})" for i, z in enumerate(agg.priority[:n])]
+    return "Top priority zones:\n" + "\n".join(lines)
+
+def _risk_margin(agg: Aggregates, q: str) -> Optional[str]:
+    if agg.risk_margin is None:
+        return None
+    return f"Minimum route risk margin: {agg.risk_margin} minutes"
+
+def _impact(agg: Aggregates, q: str) -> Optional[str]:
+    if agg.impact_population is None:
+        return None
+    return f"Estimated population in impact: {agg.impact_population:,}"
+
+def _capacity(agg: Aggregates, q: str) -> Optional[str]:
+    if agg.shelter_capacity <= 0:
+        return None
+    return f"Total shelter capacity: {agg.shelter_capacity:,}"
+
+# (intent, pattern over the normalized query, handler); first handler with an answer wins
+INTENTS: List[Tuple[str, "re.Pattern[str]", Callable[[Aggregates, str], Optional[str]]]] = [
+    ("zone_people", re.compile(r"how many .*(people|evacuees|residents)|people .*(move|evacuate)"), _zone_people),
+    ("priority", re.compile(r"priority\s+zone|which\s+zones?\s+first|evac.*priority|top\s+\d+\s+zones"), _priority),
+    ("risk_margin", re.compile(r"risk\s+margin|min.*risk.*route"), _risk_margin),
+    ("impact_population", re.compile(r"total\s+impact|population\s+in\s+(the\s+)?impact|how many.*affected|impact(ed)?\s+population"), _impact),
+    ("shelter_capacity", re.compile(r"shelter\s+capacity|beds|total\s+capacity"), _capacity),
+]
+
+_stats: Dict[str, Any] = {"fast": 0, "model": 0, "intents": defaultdict(int)}
+_stats_lock = threading.Lock()
+
+def fast_answer(query: str, agg: Aggregates) -> Tuple[Optional[str], Optional[str]]:
+    q = _norm(query)
+    for name, pat, fn in INTENTS:
+        if pat.search(q):
+            text = fn(agg, q)
+            if text is not None:
+                return name, text
+    return None, None
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        fast, model = _stats["fast"], _stats["model"]
+        total = fast + model
+        return {"fast": fast, "model": model, "total": total,
+                "fastHitRate": round(fast / total, 4) if total else 0.0,
+                "intents": dict(_stats["intents"]), "cache": cache.stats(),
+                "client": _client.stats() if _client is not None else None}
+
+# (scope, version) -> per-version index; a few versions of a few hot scenarios
+CONTEXTS_KEPT = 8
+_contexts: "OrderedDict[Tuple[str, Any], QAContext]" = OrderedDict()
+_aggregates: "OrderedDict[Tuple[str, Any], Aggregates]" = OrderedDict()
+_context_lock = threading.Lock()
+
+def _scenario_path(scope: str) -> Path:
+    if scope == DEFAULT_SCOPE:
+        return DATA_DIR / "scenario.json"
+    return DATA_DIR / "scenarios" / scope / "scenario.json"
+
+def _load_scenario(scope: str = DEFAULT_SCOPE) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(_scenario_path(scope).read_text())
+    except Exception:
+        return None
+
+Key = Tuple[str, str, Any]  # (scope, normalized query, version)
+
+class AnswerCache:
+    """
+    LRU + TTL cache of model answers keyed by (scope, normalized query, version).
+    Concurrent identical questions share one in-flight model call.
+    """
+    def __init__(self, maxsize: int = 256, ttl: float = 600.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.items: "OrderedDict[Key, Tuple[float, str]]" = OrderedDict()
+        self.flights: Dict[Key, asyncio.Future] = {}
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = 0
+
+    def lookup(self, key: Key) -> Optional[str]:
+        with self.lock:
+            hit = self.items.get(key)
+            if hit is not None and time.monotonic() - hit[0] < self.ttl:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            if hit is not None:
+                del self.items[key]
+            return None
+
+    def join(self, key: Key) -> Tuple[asyncio.Future, bool]:
+        """Returns (flight, owner): the owner computes, everyone else awaits the flight."""
+        fut = self.flights.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            return fut, False
+        fut = self.flights[key] = asyncio.get_running_loop().create_future()
+        self.misses += 1
+        return fut, True
+
+    def finish(self, key: Key, fut: asyncio.Future, value: Optional[str] = None,
+               error: Optional[BaseException] = None):
+        self.flights.pop(key, None)
+        if error is not None:
+            if fut.done():
+                return
+            if isinstance(error, Exception):
+                fut.set_exception(error)
+                fut.exception()  # mark retrieved: waiters may not exist
+            else:
+                fut.cancel()  # owner went away (client disconnect): waiters recompute
+            return
+        with self.lock:
+            self.items[key] = (time.monotonic(), value)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+        if not fut.done():
+            fut.set_result(value)
+
+    async def get_or_compute(self, key: Key, fn: Callable[[], Awaitable[str]]) -> str:
+        hit = self.lookup(key)
+        if hit is not None:
+            return hit
+        fut, owner = self.join(key)
+        if not owner:
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if fut.cancelled():
+                    return await self.get_or_compute(key, fn)
+                raise
         try:
-            data[p.stem] = json.loads(p.read_text())
-        except Exception:
-            continue
-    return data
+            value = await fn()
+        except BaseException as e:
+            self.finish(key, fut, error=e)
+            raise
+        self.finish(key, fut, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def drop_scope(self, scope: str):
+        with self.lock:
+            for key in [k for k in self.items if k[0] == scope]:
+                del self.items[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {"size": len(self.items), "hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced,
+                    "hitRate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0}
+
+cache = AnswerCache(QA_CACHE_SIZE, QA_CACHE_TTL)
+
+def invalidate(version: Any = None, scope: str = DEFAULT_SCOPE) -> None:
+    """State.on_change hook: answers for older versions of `scope` can never be hit again."""
+    cache.drop_scope(scope)
 
+def _per_version(table: "OrderedDict", scope: str, state: Dict[str, Any], build: Callable[[], Any]):
+    key = (scope, state.get("version"))
+    with _context_lock:
+        v = table.get(key)
+        if v is None:
+            v = table[key] = build()
+            while len(table) > CONTEXTS_KEPT:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return v
+
+def get_context(state: Dict[str, Any], scope: str = DEFAULT_SCOPE) -> QAContext:
+    # The scenario stored with the state; only snapshots from before it was kept read the file
+    return _per_version(_contexts, scope, state,
+                        lambda: QAContext(state, state.get("scenario") or _load_scenario(scope)))
+
+def get_aggregates(state: Dict[str, Any], scope: str = DEFAULT_SCOPE) -> Aggregates:
+    return _per_version(_aggregates, scope, state, lambda: Aggregates(state))
+
+@lru_cache(maxsize=1)
 def _find_model_request() -> Optional[Callable[..., Any]]:
     candidates = [
         "api.app.services.llm",
@@ -47,30 +410,114 @@ def _find_model_request() -> Optional[Callable[..., Any]]:
             pass
     return None
 
-def answer(query: str, state: Dict[str, Any]) -> str:
-    model_request = _find_model_request()
-    if model_request is None:
-        return "QA model is not wired: expose a callable `model_request(role, content)` in your swarm stack."
+_client: Optional[ModelClient] = None
+
+def _make_client() -> Optional[ModelClient]:
+    kw = {"max_concurrency": QA_MAX_CONCURRENCY, "timeout": QA_TIMEOUT, "retries": QA_RETRIES}
+    backend = QA_BACKEND
+    if backend == "auto":
+        backend = "http" if QA_MODEL_URL and httpx is not None else "callable"
+    if backend == "stub":
+        return StubClient(QA_STUB_LATENCY_MS, QA_STUB_TOKENS_PER_S, **kw)
+    if backend == "http":
+        return HTTPClient(QA_MODEL_URL, QA_MODEL_KEY, QA_MODEL_NAME, pool=QA_MAX_CONCURRENCY, **kw)
+    fn = _find_model_request()
+    return CallableClient(fn, **kw) if fn is not None else None
+
+def get_client() -> Optional[ModelClient]:
+    global _client
+    if _client is None:
+        _client = _make_client()
+    return _client
+
+def set_client(client: Optional[ModelClient]) -> None:
+    """Swap the backend (e.g. the stub in benchmarks); cached answers are dropped."""
+    global _client
+    _client = client
+    cache.clear()
+
+def warm() -> None:
+    """Resolve the model backend once at startup instead of per request."""
+    get_client()
 
-    flat_state = "\n".join(_flatten(state))
-    flat_json = "\n".join(_flatten(_load_all_json()))
+async def close() -> None:
+    if _client is not None:
+        await _client.aclose()
 
-    prompt = (
+def build_prompt(query: str, state: Dict[str, Any], budget_tokens: int = QA_CONTEXT_TOKENS,
+                 scope: str = DEFAULT_SCOPE) -> str:
+    facts = get_context(state, scope).select(query, budget_tokens)
+    return (
         "You are the QA agent in a disaster-response swarm. "
         "Use ONLY the provided scenario data to ground your answer, and reason step-by-step internally. "
         "Respond concisely and clearly. If the user asks 'why', include a short explanation grounded in fields you used.\n\n"
-        "Live plan state (key=value):\n"
-        f"{flat_state}\n\n"
-        "Persisted scenario JSON (key=value):\n"
-        f"{flat_json}\n\n"
+        "Plan state and scenario facts relevant to the question (key=value):\n"
+        + "\n".join(facts) + "\n\n"
         "User question:\n"
         f"{query}\n"
     )
 
-    res = model_request(role="user", content=prompt)
-    if isinstance(res, dict):
-        text = res.get("content") or res.get("text") or res.get("answer") or ""
-        return text.strip()
-    if isinstance(res, str):
-        return res.strip()
-    return "No text returned from model_request."
+NOT_WIRED = "QA model is not wired: expose a callable `model_request(role, content)` in your swarm stack, or set QA_BACKEND/QA_MODEL_URL."
+
+def _fast(query: str, state: Dict[str, Any], scope: str) -> Optional[str]:
+    intent, text = fast_answer(query, get_aggregates(state, scope))
+    with _stats_lock:
+        if intent is not None:
+            _stats["fast"] += 1
+            _stats["intents"][intent] += 1
+        else:
+            _stats["model"] += 1
+    return text
+
+async def _prompt(query: str, state: Dict[str, Any], scope: str) -> str:
+    # The fact index is built once per version; keep that first build off the loop.
+    return await asyncio.to_thread(build_prompt, query, state, QA_CONTEXT_TOKENS, scope)
+
+async def answer(query: str, state: Dict[str, Any], scope: str = DEFAULT_SCOPE) -> str:
+    text = _fast(query, state, scope)
+    if text is not None:
+        return text
+    client = get_client()
+    if client is None:
+        return NOT_WIRED
+    return await _cached_complete(client, query, state, scope)
+
+async def _cached_complete(client: ModelClient, query: str, state: Dict[str, Any], scope: str) -> str:
+    async def compute() -> str:
+        return await client.complete(await _prompt(query, state, scope))
+    return await cache.get_or_compute((scope, _norm(query), state.get("version")), compute)
+
+async def answer_stream(query: str, state: Dict[str, Any], scope: str = DEFAULT_SCOPE) -> AsyncIterator[str]:
+    """Like `answer`, but yields model tokens as they arrive."""
+    text = _fast(query, state, scope)
+    if text is not None:
+        yield text
+        return
+    client = get_client()
+    if client is None:
+        yield NOT_WIRED
+        return
+    key = (scope, _norm(query), state.get("version"))
+    hit = cache.lookup(key)
+    if hit is not None:
+        yield hit
+        return
+    fut, owner = cache.join(key)
+    if not owner:
+        try:
+            yield await asyncio.shield(fut)
+            return
+        except asyncio.CancelledError:
+            if not fut.cancelled():
+                raise
+        yield await _cached_complete(client, query, state, scope)
+        return
+    parts: List[str] = []
+    try:
+        async for tok in client.stream(await _prompt(query, state, scope)):
+            parts.append(tok)
+            yield tok
+    except BaseException as e:
+        cache.finish(key, fut, error=e)
+        raise
+    cache.finish(key, fut, "".join(parts).strip())
@@ -1,13 +1,40 @@
 from pathlib import Path
-import json, time
+from collections import OrderedDict
+import hashlib, json, time, threading
+
+from .telemetry import span
+from .codec import ENCODING, encode_section, compress
+
+try:
+    import orjson  # optional: much faster encoding of large geometry payloads
+except Exception:
+    orjson = None
+
+# Sections served by GET /state (the rest are kept only for the pipeline)
+PUBLIC_SECTIONS = ("hazard", "inundation", "demand", "transport", "shelter", "resources", "equity",
+                   "comms", "plan", "event", "timings")
+HISTORY = 32
+
+def dumps(v) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(v)
+    return json.dumps(v, separators=(",", ":")).encode("utf-8")
+
+def _join(parts: dict) -> bytes:
+    return b"{" + b",".join(dumps(k) + b":" + v for k, v in parts.items()) + b"}"
 
 class State:
-    def __init__(self, root: Path):
+    def __init__(self, root: Path, store=None):
         self.root = root
+        self.store = store
         self.version = 0
         self.updated_at = None
+        self.lock = threading.Lock()
+        # Distinguishes ETags across restarts, where version numbering restarts
+        self.epoch = format(int(time.time()), "x")
         self.cache = {
             "hazard": None,
+            "inundation": None,
             "demand": None,
             "transport": None,
             "shelter": None,
@@ -15,20 +42,178 @@ class State:
             "equity": None,
             "comms": None,
             "plan": None,
-            "event": None
+            "event": None,
+            "timings": None,
+            # Kept so the next run can reuse unchanged agent outputs
+            "land": None,
+            "impact_time": None,
+            "hashes": None,
+            # The scenario this version was computed from, so QA never mixes versions
+            "scenario": None
         }
+        # Per-version serialized sections and their digests (for ?since= deltas)
+        self.encoded = {k: b"null" for k in self.cache}
+        self.compact = {}  # section -> compact encoding, built on first request per version
+        self._bodies = {}  # (encoding, content-coding) -> compressed payload
+        self.digests: "OrderedDict[int, dict]" = OrderedDict()
+        self.digests[0] = {k: None for k in PUBLIC_SECTIONS}
+        self._payload = None
+        self.listeners = []
+
+    def _reset_bodies(self):
+        self._payload = None
+        self.compact.clear()
+        self._bodies.clear()
+
+    def _section(self, k: str, encoding: str) -> bytes:
+        if encoding != "compact":
+            return self.encoded[k]
+        body = self.compact.get(k)
+        if body is None:
+            body = self.compact[k] = dumps(encode_section(k, self.cache[k]))
+        return body
+
+    def on_change(self, fn):
+        """Register fn(version), called after every set_all outside the lock."""
+        self.listeners.append(fn)
 
     def set_all(self, d: dict):
-        for k in self.cache.keys():
-            self.cache[k] = d.get(k)
-        self.version += 1
-        self.updated_at = time.strftime("%Y-%m-%d %H:%M:%S")
-        for k, v in self.cache.items():
-            if v is not None:
-                (self.root / f"{k}.json").write_text(json.dumps(v))
+        with self.lock:
+            with span("state.encode"):
+                for k in self.cache.keys():
+                    self.cache[k] = d.get(k)
+                    self.encoded[k] = dumps(self.cache[k])
+            self.version += 1
+            self.updated_at = time.strftime("%Y-%m-%d %H:%M:%S")
+            self.digests[self.version] = {
+                k: hashlib.sha1(self.encoded[k]).hexdigest() if self.cache[k] is not None else None
+                for k in PUBLIC_SECTIONS
+            }
+            while len(self.digests) > HISTORY:
+                self.digests.popitem(last=False)
+            self._reset_bodies()
+            version = self.version
+            if self.store is not None:
+                # Persisted off the request path as one atomic, versioned snapshot
+                self.store.save(version, self._snapshot_bytes())
+        for fn in self.listeners:
+            try:
+                fn(version)
+            except Exception:
+                pass
+        return version
+
+    def _snapshot_bytes(self) -> bytes:
+        parts = dict(self.encoded)
+        parts["version"] = dumps(self.version)
+        parts["updatedAt"] = dumps(self.updated_at)
+        return _join(parts)
+
+    def restore(self) -> bool:
+        """Load the newest persisted snapshot, so a restarted worker serves the last plan."""
+        if self.store is None:
+            return False
+        snap = self.store.load_latest()
+        if not snap:
+            return False
+        with self.lock:
+            for k in self.cache.keys():
+                self.cache[k] = snap.get(k)
+                self.encoded[k] = dumps(self.cache[k])
+            # Number on from the newest file on disk, even one that could not be read,
+            # so new snapshots never collide with or sort below it
+            self.version = max(int(snap.get("version") or 0), getattr(self.store, "newest", 0))
+            self.updated_at = snap.get("updatedAt")
+            self.digests.clear()
+            self.digests[self.version] = {
+                k: hashlib.sha1(self.encoded[k]).hexdigest() if self.cache[k] is not None else None
+                for k in PUBLIC_SECTIONS
+            }
+            self._reset_bodies()
+        return True
 
     def snapshot(self):
-        s = {**self.cache}
-        s["version"] = self.version
-        s["updatedAt"] = self.updated_at
+        with self.lock:
+            s = {**self.cache}
+            s["version"] = self.version
+            s["updatedAt"] = self.updated_at
         return s
+
+    def etag(self) -> str:
+        return f'"{self.epoch}-{self.version}"'
+
+    def _full(self, encoding: str) -> bytes:
+        parts = {k: self._section(k, encoding) for k in PUBLIC_SECTIONS}
+        if encoding == "compact":
+            parts["encoding"] = dumps(ENCODING)
+        parts["version"] = dumps(self.version)
+        parts["updatedAt"] = dumps(self.updated_at)
+        return _join(parts)
+
+    def _body(self, encoding: str, coding: str | None) -> bytes:
+        if encoding == "json" and coding is None:
+            if self._payload is None:
+                self._payload = self._full("json")
+            return self._payload
+        key = (encoding, coding)
+        body = self._bodies.get(key)
+        if body is None:
+            body = self._bodies[key] = self._full(encoding) if coding is None else compress(self._body(encoding, None), coding)
+        return body
+
+    def payload(self, encoding: str = "json", coding: str | None = None) -> bytes:
+        """GET /state body for the current version, serialized (and compressed) once per encoding."""
+        with self.lock:
+            return self._body(encoding, coding)
+
+    def view(self, encoding: str = "json", coding: str | None = None, since: int | None = None,
+             min_compress: int = 0):
+        """
+        (version, body, content-coding) for GET /state, read under one lock so
+        an ETag built from the version always belongs to the body. Bodies under
+        `min_compress` bytes are sent uncompressed.
+        """
+        with self.lock:
+            if since is not None:
+                body = self._delta(since, encoding)
+                if coding is None or len(body) < min_compress:
+                    return self.version, body, None
+                return self.version, compress(body, coding), coding
+            if coding is not None and len(self._body(encoding, None)) < min_compress:
+                coding = None
+            return self.version, self._body(encoding, coding), coding
+
+    def _changed_since(self, since: int):
+        old = self.digests.get(since)
+        cur = self.digests.get(self.version)
+        if old is None or cur is None:
+            return None
+        return [k for k in PUBLIC_SECTIONS if old.get(k) != cur.get(k)]
+
+    def changed_since(self, since: int):
+        """Sections whose content differs from version `since`; None if it is no longer tracked."""
+        with self.lock:
+            return self._changed_since(since)
+
+    def delta(self, since: int, encoding: str = "json") -> bytes:
+        """
+        Body for GET /state?since=N: only the changed top-level sections.
+        Falls back to every section (full=true) when N is too old.
+        """
+        with self.lock:
+            return self._delta(since, encoding)
+
+    def _delta(self, since: int, encoding: str) -> bytes:
+        changed = self._changed_since(since)
+        full = changed is None
+        keys = PUBLIC_SECTIONS if full else changed
+        parts = {
+            "version": dumps(self.version),
+            "since": dumps(since),
+            "full": dumps(full),
+            "updatedAt": dumps(self.updated_at),
+            "changed": _join({k: self._section(k, encoding) for k in keys}),
+        }
+        if encoding == "compact":
+            parts["encoding"] = dumps(ENCODING)
+        return _join(parts)
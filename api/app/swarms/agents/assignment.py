@@ -0,0 +1,131 @@
+from collections import deque
+import heapq
+import math
+
+def solve_min_cost_flow(supply, capacity, candidates, unmet_cost):
+    """
+    Transportation problem between zones (supply = people) and shelters
+    (capacity = beds) over a sparse candidate set.
+
+    candidates[z] is a list of (shelter index, integer cost per person).
+    Every zone also has an overflow arc at `unmet_cost`, so the flow is
+    always feasible and whatever cannot be sheltered shows up as unmet.
+
+    Primal-dual min-cost flow: Dijkstra with potentials finds the current
+    shortest distance, then a Dinic blocking flow saturates *all* shortest
+    paths at that distance at once, so the number of Dijkstra rounds is the
+    number of distinct path costs rather than the number of augmentations.
+
+    Returns (flows, unmet): flows[z] is a list of (shelter index, people).
+    """
+    nz, nh = len(supply), len(capacity)
+    S, T = 0, nz + nh + 1
+    n = T + 1
+    to, cap, cost = [], [], []
+    adj = [[] for _ in range(n)]
+
+    def arc(u, v, c, w):
+        adj[u].append(len(to)); to.append(v); cap.append(c); cost.append(w)
+        adj[v].append(len(to)); to.append(u); cap.append(0); cost.append(-w)
+
+    zone_arcs = []
+    for z in range(nz):
+        s = int(supply[z])
+        arc(S, 1 + z, s, 0)
+        zs = []
+        for h, w in candidates[z]:
+            zs.append((h, len(to)))
+            arc(1 + z, 1 + nz + h, s, int(w))
+        zone_arcs.append(zs)
+        arc(1 + z, T, s, int(unmet_cost))
+    for h in range(nh):
+        arc(1 + nz + h, T, int(capacity[h]), 0)
+
+    pot = [0] * n
+    remaining = sum(int(x) for x in supply)
+    while remaining > 0:
+        # Dijkstra on reduced costs
+        dist = [math.inf] * n
+        dist[S] = 0
+        heap = [(0, S)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            pu = pot[u]
+            for e in adj[u]:
+                if cap[e] <= 0:
+                    continue
+                v = to[e]
+                nd = d + cost[e] + pu - pot[v]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        if dist[T] == math.inf:
+            break
+        dT = dist[T]
+        for v in range(n):
+            pot[v] += min(dist[v], dT)
+
+        # Blocking flow over admissible (zero reduced cost) residual arcs
+        pushed_round = 0
+        while True:
+            level = [-1] * n
+            level[S] = 0
+            q = deque([S])
+            while q:
+                u = q.popleft()
+                for e in adj[u]:
+                    v = to[e]
+                    if cap[e] > 0 and level[v] < 0 and cost[e] + pot[u] - pot[v] == 0:
+                        level[v] = level[u] + 1
+                        q.append(v)
+            if level[T] < 0:
+                break
+            it = [0] * n
+            while True:
+                # Iterative DFS for one augmenting path in the level graph
+                path = []
+                u = S
+                while u != T:
+                    advanced = False
+                    while it[u] < len(adj[u]):
+                        e = adj[u][it[u]]
+                        v = to[e]
+                        if cap[e] > 0 and level[v] == level[u] + 1 and cost[e] + pot[u] - pot[v] == 0:
+                            path.append(e)
+                            u = v
+                            advanced = True
+                            break
+                        it[u] += 1
+                    if not advanced:
+                        if u == S:
+                            break
+                        level[u] = -1  # dead end
+                        e = path.pop()
+                        u = to[e ^ 1]
+                        it[u] += 1
+                if u != T:
+                    break
+                f = min(cap[e] for e in path)
+                for e in path:
+                    cap[e] -= f
+                    cap[e ^ 1] += f
+                pushed_round += f
+                remaining -= f
+        if pushed_round == 0:
+            break
+
+    flows = []
+    unmet = []
+    for z in range(nz):
+        zf = []
+        for h, e in zone_arcs[z]:
+            f = cap[e ^ 1]
+            if f > 0:
+                zf.append((h, f))
+        flows.append(zf)
+        unmet.append(int(supply[z]) - sum(f for _, f in zf))
+    return flows, unmet
+
+__all__ = ["solve_min_cost_flow"]
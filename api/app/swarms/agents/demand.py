@@ -1,18 +1,31 @@
-from shapely.geometry import shape, Polygon
-from shapely.ops import unary_union
+from .geom import zone_index, merge_features
+from .popgrid import load_popgrid
 
 def demand_agent(scenario, hazard, prev):
     """
     Estimates impacted population per zone by intersecting each zone polygon
-    with the hazard impact mask. Also returns a small point FeatureCollection
-    (centroids) so you can visualize demand if needed.
+    with the hazard impact mask (or the ensemble's expected impact, if run).
+    With a `population_grid`, zones the impact touches are counted from the
+    raster instead of assuming people spread evenly over the polygon. Also
+    returns a small point FeatureCollection (centroids) so you can visualize
+    demand if needed.
     """
     zones = scenario.get("zones", [])
     impact = hazard.get("impact_mask") or hazard.get("impact") or {"type":"FeatureCollection","features":[]}
 
-    merged = None
-    if impact["features"]:
-        merged = unary_union([shape(f["geometry"]) for f in impact["features"]])
+    ensemble = (hazard.get("ensemble") or {}).get("by_zone") or {}
+
+    merged = merge_features(impact)
+    zix = zone_index(zones)
+    overlap = zix.overlay(merged) if merged else {}
+    gridded = {}
+    grid = load_popgrid(scenario) if merged else None
+    if grid is not None:
+        hit = [zid for zid, a in overlap.items() if a and zix.polygon(zid) is not None]
+        polys = [zix.polygon(zid) for zid in hit]
+        for zid, total, impacted in zip(hit, grid.sums(polys), grid.sums(polys, within=merged)):
+            if total > 0:  # NaN (off the grid) and empty cells keep the authored estimate
+                gridded[zid] = (total, impacted)
 
     feats = []
     by_zone = {}
@@ -24,15 +37,25 @@ def demand_agent(scenario, hazard, prev):
         if cx is not None and cy is not None:
             feats.append({"type":"Feature","properties":{"zone":z["id"],"population":pop},"geometry":{"type":"Point","coordinates":[cx,cy]}})
 
-        if z.get("polygon") and merged:
-            poly = Polygon(z["polygon"])
-            inter = poly.intersection(merged)
-            frac = 0.0 if poly.area == 0 else max(0.0, min(1.0, inter.area / poly.area))
+        poly = zix.polygon(z["id"])
+        if poly is not None and merged:
+            inter_area = overlap.get(z["id"], 0.0)
+            frac = 0.0 if poly.area == 0 else max(0.0, min(1.0, inter_area / poly.area))
         else:
             frac = 0.0 if not impact["features"] else 0.25
 
+        if z["id"] in gridded:
+            total, people = gridded[z["id"]]
+            pop, frac = int(round(total)), float(people / total)
         impacted = int(round(pop * frac))
         by_zone[z["id"]] = {"population": pop, "impacted": impacted, "impact_fraction": round(frac, 3)}
+        if z["id"] in gridded:
+            by_zone[z["id"]]["source"] = "grid"
+        ens = ensemble.get(z["id"])
+        if ens is not None:
+            # Ensemble mode: plan for the expected impacted population, keep the single-run figure
+            by_zone[z["id"]].update(impacted=ens["expected_affected"], impacted_central=impacted, p_impact=ens["p_impact"])
+            impacted = ens["expected_affected"]
         total_impacted += impacted
 
     return {
@@ -0,0 +1,88 @@
+import heapq
+
+DEFAULT_CAPACITY = {"bus": 50, "van": 8}
+
+def build_fleet(assets):
+    """Vehicles from assets.buses / assets.med_vans (capacities overridable)."""
+    assets = assets or {}
+    fleet = []
+    for kind, count_key, cap_key in (("bus", "buses", "bus_capacity"), ("van", "med_vans", "van_capacity")):
+        cap = int(assets.get(cap_key, DEFAULT_CAPACITY[kind]))
+        for i in range(int(assets.get(count_key, 0))):
+            fleet.append({"id": f"{kind}-{i + 1}", "type": kind, "capacity": cap})
+    return fleet
+
+def dispatch(vehicles, pickups, load_min=5):
+    """
+    Multi-trip schedule by event simulation.
+
+    Vehicles start staged at shelters at t=0. Whenever a vehicle frees up
+    (earliest first, via a heap) it takes the pickup with the earliest
+    cutoff it can still reach in time, drives out (eta_min), loads
+    (load_min) and drives back (eta_min), then re-enters the heap.
+    Partially served pickups go back into the queue, so consecutive free
+    vehicles rotate over the most urgent zones. Since vehicle free times
+    only grow, a pickup unreachable now is unreachable for good and its
+    remaining people are unmet.
+
+    pickups: dicts with zone, shelter, people, eta_min, cutoff_min.
+    """
+    itineraries = {v["id"]: [] for v in vehicles}
+    remaining = [int(p.get("people", 0)) for p in pickups]
+    queue = [(int(p.get("cutoff_min", 60)), i) for i, p in enumerate(pickups) if remaining[i] > 0]
+    heapq.heapify(queue)
+    fleet = [(0, j) for j in range(len(vehicles)) if vehicles[j]["capacity"] > 0]
+    heapq.heapify(fleet)
+    moved = {}
+    late = {}
+
+    while queue and fleet:
+        t, j = heapq.heappop(fleet)
+        v = vehicles[j]
+        chosen = None
+        while queue:
+            cutoff, i = queue[0]
+            if t + int(pickups[i].get("eta_min", 0)) <= cutoff:
+                chosen = i
+                break
+            heapq.heappop(queue)
+            zid = pickups[i].get("zone")
+            late[zid] = late.get(zid, 0) + remaining[i]
+            remaining[i] = 0
+        if chosen is None:
+            break
+        p = pickups[chosen]
+        eta = int(p.get("eta_min", 0))
+        n = min(v["capacity"], remaining[chosen])
+        remaining[chosen] -= n
+        if remaining[chosen] <= 0:
+            heapq.heappop(queue)
+        pickup_at = t + eta
+        arrive = pickup_at + load_min + eta
+        itineraries[v["id"]].append({
+            "zone": p.get("zone"),
+            "shelter": p.get("shelter"),
+            "people": n,
+            "depart": t,
+            "pickupAt": pickup_at,
+            "arrive": arrive
+        })
+        moved[p.get("zone")] = moved.get(p.get("zone"), 0) + n
+        heapq.heappush(fleet, (arrive, j))
+
+    # Whatever is still queued when the fleet runs out is unmet too
+    for _, i in queue:
+        if remaining[i] > 0:
+            zid = pickups[i].get("zone")
+            late[zid] = late.get(zid, 0) + remaining[i]
+
+    return {
+        "itineraries": [{"vehicle": v["id"], "type": v["type"], "trips": itineraries[v["id"]]}
+                        for v in vehicles if itineraries[v["id"]]],
+        "movedByZone": moved,
+        "unmetByZone": late,
+        "moved": sum(moved.values()),
+        "trips": sum(len(t) for t in itineraries.values()),
+    }
+
+__all__ = ["build_fleet", "dispatch"]
@@ -0,0 +1,162 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import numpy as np
+import shapely
+from shapely import STRtree
+
+KM_DEG = 1 / 111.32
+BUFFER_DEG = 0.002  # outward buffer applied by _amoeba_blob
+GRID = 200          # cells along each side of the ensemble window
+BATCH = 64          # realizations rasterized per array op (B x cells floats)
+MIN_POOL_N = 128    # below this the batches run inline
+
+# One thread pool per process, started lazily and shared by every run: the
+# per-cell array ops release the GIL, and nothing is forked from the
+# (threaded, often already pooled) pipeline worker.
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def ensemble_conf(impact_seed: dict):
+    """
+    `impact_seed.ensemble`: a realization count, or {n, seed, radius_sd,
+    lobes_sd, jitter_sd, grid, min_p, workers}; None when ensemble mode is off.
+    """
+    e = (impact_seed or {}).get("ensemble")
+    if not e:
+        return None
+    if isinstance(e, (int, float)):
+        e = {"n": int(e)}
+    return {
+        "n": max(1, int(e.get("n", 100))),
+        "seed": int(e.get("seed", 0)),
+        "radius_sd": float(e.get("radius_sd", 0.15)),  # relative
+        "lobes_sd": float(e.get("lobes_sd", 1.0)),
+        "jitter_sd": float(e.get("jitter_sd", 0.1)),
+        "grid": max(16, int(e.get("grid", GRID))),
+        "min_p": float(e.get("min_p", 0.1)),
+        "workers": e.get("workers"),
+    }
+
+def draw_realizations(conf: dict, radius_km: float, lobes: int, jitter: float):
+    """Per-realization (radius_deg, lobes, jitter) perturbed around the impact seed."""
+    rng = np.random.default_rng(conf["seed"])
+    n = conf["n"]
+    r = radius_km * KM_DEG * np.clip(1 + conf["radius_sd"] * rng.standard_normal(n), 0.2, None)
+    lb = np.maximum(1, np.rint(lobes + conf["lobes_sd"] * rng.standard_normal(n)))
+    jt = np.clip(jitter + conf["jitter_sd"] * rng.standard_normal(n), 0.0, 1.0)
+    return r, lb, jt
+
+def _rasterize(args):
+    """
+    Realizations [start, start+B) against the land cells: each blob is a polar
+    radius function r(theta) (the same wobble as _amoeba_blob), so a cell is
+    inside when its distance from the anchor is below the interpolated radius.
+    Returns per-cell hit counts and per-zone "any cell hit" counts.
+    """
+    d, theta, r, lobes, jitter, seed, start, steps, pair_cells, starts = args
+    rng = np.random.default_rng([seed, start])
+    t = 2 * np.pi * np.arange(steps) / steps
+    noise = rng.uniform(-1, 1, (len(r), steps))
+    radii = r[:, None] * (1 + jitter[:, None] * 0.5 * np.sin(lobes[:, None] * t + 0.7) + jitter[:, None] * 0.3 * noise)
+    pos = theta / (2 * np.pi) * steps
+    i0 = np.floor(pos).astype(np.int64) % steps
+    w = pos - np.floor(pos)
+    inside = d <= radii[:, i0] * (1 - w) + radii[:, (i0 + 1) % steps] * w + BUFFER_DEG
+    counts = inside.sum(axis=0)
+    zone_hits = (np.add.reduceat(inside[:, pair_cells], starts, axis=1) > 0).sum(axis=0) if len(starts) else np.zeros(0, int)
+    return counts, zone_hits
+
+def _workers(conf: dict) -> int:
+    from ...deps.settings import ENSEMBLE_WORKERS
+    w = conf.get("workers") or ENSEMBLE_WORKERS or os.cpu_count() or 1
+    return max(1, int(w))
+
+def _get_pool(workers: int) -> ThreadPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool, _pool_workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ensemble"), workers
+        return _pool
+
+def run_ensemble(center, radius_km: float, lobes: int, jitter: float, conf: dict, land_near, zones):
+    """
+    Monte-Carlo impact ensemble. `land_near(bbox)` returns the land geometry
+    inside a window (or None), `zones` is [(zone id, polygon)]. Returns
+    per-zone exceedance probability (any part impacted) and expected impacted
+    fraction, or None when the window holds no land.
+    """
+    lon, lat = center
+    r, lb, jt = draw_realizations(conf, radius_km, lobes, jitter)
+    reach = float(np.max(r * (1 + 0.8 * jt))) + BUFFER_DEG
+    bounds = (lon - reach, lat - reach, lon + reach, lat + reach)
+    g = conf["grid"]
+    xs = np.linspace(bounds[0], bounds[2], g)
+    ys = np.linspace(bounds[1], bounds[3], g)
+    gx, gy = (a.ravel() for a in np.meshgrid(xs, ys))
+
+    # Land cells once, shared by every realization
+    land = land_near(bounds)
+    if land is not None:
+        shapely.prepare(land)
+        on = shapely.contains_xy(land, gx, gy)
+        gx, gy = gx[on], gy[on]
+    if not len(gx):
+        return None
+    dx, dy = gx - lon, gy - lat
+    d = np.hypot(dx, dy)
+    theta = np.mod(np.arctan2(dy, dx), 2 * np.pi)
+
+    # (zone, cell) pairs grouped by zone; zones smaller than a cell take their nearest cell
+    ids = [zid for zid, _ in zones]
+    polys = np.array([p for _, p in zones], dtype=object)
+    if len(polys):
+        tree = STRtree(shapely.points(gx, gy))
+        zi, ci = tree.query(polys, predicate="contains")
+        empty = np.setdiff1d(np.arange(len(polys)), zi)
+        if len(empty):
+            reps = shapely.point_on_surface(polys[empty])
+            inside = shapely.intersects_xy(shapely.box(*bounds), shapely.get_x(reps), shapely.get_y(reps))
+            empty, reps = empty[inside], reps[inside]
+        if len(empty):
+            zi, ci = np.concatenate([zi, empty]), np.concatenate([ci, tree.nearest(reps)])
+        order = np.lexsort((ci, zi))
+        zi, ci = zi[order], ci[order]
+        starts = np.flatnonzero(np.r_[True, zi[1:] != zi[:-1]]) if len(zi) else np.zeros(0, dtype=np.int64)
+        sizes = np.diff(np.r_[starts, len(zi)])
+        covered = zi[starts]
+    else:
+        ci = starts = sizes = covered = np.zeros(0, dtype=np.int64)
+
+    n = conf["n"]
+    steps = max(36, int(lb.max()) * 24)
+    jobs = [(d, theta, r[s:s + BATCH], lb[s:s + BATCH], jt[s:s + BATCH], conf["seed"], s, steps, ci, starts)
+            for s in range(0, n, BATCH)]
+    workers = min(_workers(conf), len(jobs))
+    if n >= MIN_POOL_N and workers > 1:
+        results = list(_get_pool(workers).map(_rasterize, jobs))
+    else:
+        results = [_rasterize(j) for j in jobs]
+    counts = sum(c for c, _ in results)
+    hits = sum(h for _, h in results)
+
+    p_cell = counts / n
+    by_zone = {zid: {"p_impact": 0.0, "expected_fraction": 0.0} for zid in ids}
+    if len(starts):
+        mean_p = np.add.reduceat(p_cell[ci], starts) / sizes
+        for j, k in enumerate(covered):
+            by_zone[ids[k]] = {"p_impact": round(float(hits[j]) / n, 3), "expected_fraction": round(float(mean_p[j]), 4)}
+    return {
+        "n": n,
+        "seed": conf["seed"],
+        "workers": workers if n >= MIN_POOL_N else 1,
+        "cells": int(len(gx)),
+        "bounds": [round(b, 6) for b in bounds],
+        "p_max": round(float(p_cell.max()), 3),
+        "by_zone": by_zone,
+    }
+
+__all__ = ["ensemble_conf", "draw_realizations", "run_ensemble"]
@@ -0,0 +1,149 @@
+from collections import OrderedDict
+import threading
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import Polygon, shape
+from shapely.ops import unary_union
+
+try:
+    from scipy.spatial import cKDTree  # optional: faster for very large point sets
+except Exception:
+    cKDTree = None
+
+R_KM = 6371.0
+KDTREE_MIN_POINTS = 2048
+_CACHE_MAX = 4
+_cache: "OrderedDict[int, ZoneIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+class ZoneIndex:
+    """
+    Authored zone polygons built once, with an STRtree so impact overlays
+    only touch zones whose bbox meets the impact.
+    """
+    def __init__(self, zones):
+        self.zones = zones
+        self.pos = {}          # zone id -> row in polys
+        self.ids = []
+        polys = []
+        for z in zones:
+            if not z.get("polygon"):
+                continue
+            try:
+                p = Polygon(z["polygon"])
+            except Exception:
+                continue
+            self.pos[z["id"]] = len(polys)
+            self.ids.append(z["id"])
+            polys.append(p)
+        self.polys = np.asarray(polys, dtype=object)
+        self.areas = shapely.area(self.polys) if len(polys) else np.empty(0)
+        self.tree = STRtree(self.polys)
+
+    def polygon(self, zid):
+        i = self.pos.get(zid)
+        return None if i is None else self.polys[i]
+
+    def overlay(self, geom):
+        """
+        Returns {zone id: intersection area} for zones meeting `geom`.
+        Zones fully inside are taken at their own area; only edge zones are
+        intersected, in one vectorized call.
+        """
+        if geom is None or geom.is_empty or not len(self.polys):
+            return {}
+        idx = self.tree.query(geom, predicate="intersects")
+        if not len(idx):
+            return {}
+        shapely.prepare(geom)
+        inside = shapely.contains(geom, self.polys[idx])
+        areas = self.areas[idx].copy()
+        edge = ~inside
+        if edge.any():
+            areas[edge] = shapely.area(shapely.intersection(self.polys[idx[edge]], geom))
+        return {self.ids[i]: float(a) for i, a in zip(idx, areas)}
+
+def zone_index(zones):
+    """Per-list cache: hazard and demand in the same run share one index."""
+    key = id(zones)
+    with _cache_lock:
+        idx = _cache.get(key)
+        if idx is not None and idx.zones is zones:
+            _cache.move_to_end(key)
+            return idx
+    idx = ZoneIndex(zones)
+    with _cache_lock:
+        _cache[key] = idx
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return idx
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Vectorized great-circle distance in km (scalars or NumPy arrays)."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    x = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * R_KM * np.arcsin(np.sqrt(np.minimum(x, 1.0)))
+
+def _unit_vectors(lon, lat):
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    c = np.cos(lat)
+    return np.column_stack((c * np.cos(lon), c * np.sin(lon), np.sin(lat)))
+
+class PointIndex:
+    """
+    k-nearest lookup over lon/lat points. Points live on the unit sphere,
+    where chord length orders exactly like great-circle distance, so a
+    KD-tree (scipy, for large sets) or one matrix product answers a whole
+    batch of queries at once.
+    """
+    def __init__(self, lon, lat):
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.xyz = _unit_vectors(self.lon, self.lat)
+        self.tree = cKDTree(self.xyz) if cKDTree is not None and len(self.xyz) >= KDTREE_MIN_POINTS else None
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def nearest(self, lon, lat, k=1):
+        """(indices, km), both shaped (n_queries, k) and sorted by distance."""
+        q = _unit_vectors(np.atleast_1d(lon), np.atleast_1d(lat))
+        k = max(1, min(k, len(self.xyz)))
+        if self.tree is not None:
+            chord, idx = self.tree.query(q, k=k)
+            idx = np.asarray(idx).reshape(len(q), k)
+            chord = np.asarray(chord).reshape(len(q), k)
+        else:
+            idx = np.empty((len(q), k), dtype=np.int64)
+            chord = np.empty((len(q), k))
+            step = max(1, 4_000_000 // max(len(self.xyz), 1))
+            for i in range(0, len(q), step):
+                dot = q[i:i + step] @ self.xyz.T
+                part = np.argpartition(-dot, k - 1, axis=1)[:, :k] if k < dot.shape[1] else np.tile(np.arange(k), (len(dot), 1))
+                d = np.take_along_axis(dot, part, axis=1)
+                order = np.argsort(-d, axis=1)
+                idx[i:i + step] = np.take_along_axis(part, order, axis=1)
+                chord[i:i + step] = np.sqrt(np.maximum(2.0 - 2.0 * np.take_along_axis(d, order, axis=1), 0.0))
+        km = 2 * R_KM * np.arcsin(np.minimum(chord / 2.0, 1.0))
+        return idx, km
+
+def outside_mask(geom, lon, lat):
+    """True where a point is not inside `geom` (batched containment)."""
+    lon = np.asarray(lon, dtype=float)
+    if geom is None or geom.is_empty or not len(lon):
+        return np.ones(len(lon), dtype=bool)
+    shapely.prepare(geom)
+    return ~shapely.contains_xy(geom, lon, np.asarray(lat, dtype=float))
+
+def merge_features(fc):
+    """Single geometry for a FeatureCollection; skips the union for one feature."""
+    feats = (fc or {}).get("features") or []
+    if not feats:
+        return None
+    if len(feats) == 1:
+        return shape(feats[0]["geometry"])
+    return unary_union([shape(f["geometry"]) for f in feats])
+
+__all__ = ["ZoneIndex", "zone_index", "merge_features", "PointIndex", "outside_mask", "haversine_km"]
@@ -1,19 +1,26 @@
-from shapely.geometry import Polygon, MultiPolygon, Point, box, mapping, MultiPoint
+from shapely.geometry import Polygon, MultiPolygon, mapping, MultiPoint
 from shapely.ops import unary_union, voronoi_diagram
+import shapely
+import numpy as np
 import math, random
 from pathlib import Path
 from .landmask import resolve_landmask
+from .geom import zone_index
+from .ensemble import ensemble_conf, run_ensemble
+from .popgrid import load_popgrid
+from ...telemetry import registry, span, traced
 
 KM_DEG = 1 / 111.32
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
 
-def _amoeba_blob(center, radius_km=5.0, lobes=5, jitter=0.3):
+def _amoeba_blob(center, radius_km=5.0, lobes=5, jitter=0.3, rng=random):
     lon, lat = center
     r = radius_km * KM_DEG
     pts = []
     steps = max(36, lobes * 24)
     for i in range(steps):
         t = 2 * math.pi * i / steps
-        wobble = 1 + jitter * 0.5 * math.sin(lobes * t + 0.7) + jitter * 0.3 * random.uniform(-1, 1)
+        wobble = 1 + jitter * 0.5 * math.sin(lobes * t + 0.7) + jitter * 0.3 * rng.uniform(-1, 1)
         rr = r * wobble
         pts.append((lon + rr * math.cos(t), lat + rr * math.sin(t)))
     return Polygon(pts).buffer(0.002)
@@ -26,7 +33,10 @@ def _impact_polygon_raw(scenario):
     radius = float(seed.get("radius_km", 5.0))
     lobes = int(seed.get("lobes", 5))
     jitter = float(seed.get("jitter", 0.3))
-    return _amoeba_blob(center, radius, lobes, jitter)
+    conf = ensemble_conf(seed)
+    # Ensemble runs also pin the central realization, so the plan is reproducible
+    rng = random.Random(conf["seed"]) if conf else random
+    return _amoeba_blob(center, radius, lobes, jitter, rng)
 
 def _iter_polys(geom):
     if geom is None:
@@ -57,24 +67,12 @@ def _largest_polygon(geom):
             best_area = a
     return best
 
-def _land_union_from_zones(scenario):
-    zones = scenario.get("zones") or []
-    geoms = []
-    for z in zones:
-        if z.get("polygon"):
-            try:
-                geoms.append(Polygon(z["polygon"]))
-            except Exception:
-                pass
-    if not geoms:
-        return None
-    return unary_union(geoms).buffer(0.0008)
-
+@traced("hazard.clip")
 def _clip_impact_to_land(impact_poly, scenario):
     if impact_poly is None:
         return None
-    data_dir = Path(__file__).resolve().parents[2] / "data"
-    land_union = resolve_landmask(scenario, data_dir)
+    # Only the land near the impact is clipped against, not the whole mask
+    land_union = resolve_landmask(scenario, DATA_DIR, bbox=impact_poly.buffer(0.001).bounds)
     if land_union is None:
         return impact_poly
     inter = impact_poly.intersection(land_union)
@@ -103,6 +101,7 @@ def _densify_polygon(poly: Polygon, max_seg_km=0.05):
     holes = [densify_ring(list(r.coords)) for r in poly.interiors]
     return Polygon(ext, holes).buffer(0)
 
+@traced("hazard.densify")
 def _densify_any(geom, max_seg_km=0.05):
     parts = []
     for g in _iter_polys(geom):
@@ -118,60 +117,63 @@ def _poly_area_km2(poly: Polygon, lat_ref=None):
     km_per_deg_lon = 111.32 * math.cos(math.radians(lat_ref))
     return poly.area * km_per_deg_lat * km_per_deg_lon
 
-def _random_point_in_poly(poly: Polygon):
+def _poisson_points(poly: Polygon, count: int, rng):
+    # Rejection-sample in batches: one vectorized containment test per batch
+    if count <= 0:
+        return np.empty((0, 2))
     minx, miny, maxx, maxy = poly.bounds
-    for _ in range(1000):
-        x = random.uniform(minx, maxx)
-        y = random.uniform(miny, maxy)
-        p = Point(x, y)
-        if poly.contains(p):
-            return p
-    return poly.representative_point()
-
-def _poisson_points(poly: Polygon, count: int):
-    pts = []
-    for _ in range(count):
-        pts.append(_random_point_in_poly(poly))
-    return pts
-
-def _centroid_of(poly: Polygon):
-    c = poly.representative_point()
-    return Point(c.x, c.y)
-
+    box_area = max((maxx - minx) * (maxy - miny), 1e-18)
+    fill = max(poly.area / box_area, 0.05)
+    shapely.prepare(poly)
+    found = []
+    have = 0
+    for _ in range(20):
+        need = count - have
+        if need <= 0:
+            break
+        n = int(need / fill * 1.2) + 16
+        xs = rng.uniform(minx, maxx, n)
+        ys = rng.uniform(miny, maxy, n)
+        inside = shapely.contains_xy(poly, xs, ys)
+        if inside.any():
+            pts = np.column_stack((xs[inside], ys[inside]))[:need]
+            found.append(pts)
+            have += len(pts)
+    if have < count:
+        rp = poly.representative_point()
+        found.append(np.tile([rp.x, rp.y], (count - have, 1)))
+    return np.concatenate(found)
+
+@traced("hazard.voronoi")
+def _voronoi_cells(poly: Polygon, pts):
+    vd = voronoi_diagram(MultiPoint(pts), envelope=poly.envelope.buffer(1.0), tolerance=0.0)
+    cells = np.asarray(vd.geoms)
+    # Interior cells need no clipping; only cells crossing the boundary are intersected,
+    # each against the polygon pre-clipped to its bbox rather than the full outline
+    shapely.prepare(poly)
+    edge = ~shapely.contains(poly, cells)
+    local = np.array([shapely.clip_by_rect(poly, *b) for b in shapely.bounds(cells[edge])], dtype=object)
+    cells[edge] = shapely.intersection(cells[edge], local)
+    parts = shapely.get_parts(cells)
+    keep = (shapely.get_type_id(parts) == 3) & ~shapely.is_empty(parts)
+    return parts[keep]
+
+@traced("hazard.lloyd")
 def _lloyd_relax(poly: Polygon, pts, iterations=2):
     for _ in range(iterations):
-        mp = MultiPoint(pts)
-        vd = voronoi_diagram(mp, envelope=poly.envelope.buffer(1.0), tolerance=0.0)
-        new_pts = []
-        for cell in vd.geoms:
-            cell_clip = cell.intersection(poly)
-            for g in _iter_polys(cell_clip):
-                new_pts.append(_centroid_of(g))
-        if new_pts:
-            pts = new_pts
+        cells = _voronoi_cells(poly, pts)
+        if len(cells):
+            pts = shapely.get_coordinates(shapely.point_on_surface(cells))
     return pts
 
-def _voronoi_cells(poly: Polygon, pts):
-    mp = MultiPoint(pts)
-    vd = voronoi_diagram(mp, envelope=poly.envelope.buffer(1.0), tolerance=0.0)
-    cells = []
-    for cell in vd.geoms:
-        cell_clip = cell.intersection(poly)
-        for g in _iter_polys(cell_clip):
-            cells.append(g)
-    return cells
-
-def _min_distance_to_boundary_km(poly_like, point: Point):
-    min_deg = None
-    for p in _iter_polys(poly_like):
-        d = point.distance(p.exterior)
-        if min_deg is None or d < min_deg:
-            min_deg = d
-    if min_deg is None:
-        return 0.0
-    km_per_deg_lat = 111.32
-    km_per_deg_lon = 111.32 * math.cos(math.radians(point.y))
-    return min_deg * max(km_per_deg_lat, km_per_deg_lon)
+def _min_distance_to_boundary_km(poly_like, points):
+    rings = [p.exterior for p in _iter_polys(poly_like)]
+    if not rings or not len(points):
+        return np.zeros(len(points))
+    d = shapely.distance(points[:, None], np.asarray(rings)[None, :]).min(axis=1)
+    ys = shapely.get_y(points)
+    km_per_deg_lon = 111.32 * np.cos(np.radians(ys))
+    return d * np.maximum(111.32, km_per_deg_lon)
 
 def _generate_voronoi_subzones(impact_poly, scenario):
     if impact_poly is None or impact_poly.is_empty:
@@ -180,6 +182,7 @@ def _generate_voronoi_subzones(impact_poly, scenario):
     conf = (scenario.get("auto_subzones") or {})
     target_km2 = float(conf.get("target_km2", 0.6))
     count = conf.get("count")
+    rng = np.random.default_rng(conf.get("seed"))
     density_default = float((scenario.get("defaults") or {}).get("density_per_km2", 4000))
     cutoff_min = int((scenario.get("defaults") or {}).get("cutoff_min", 60))
 
@@ -188,38 +191,47 @@ def _generate_voronoi_subzones(impact_poly, scenario):
 
     dens = _densify_any(impact_poly, max_seg_km=0.15)
     main_poly = _largest_polygon(dens) or _largest_polygon(impact_poly) or next(_iter_polys(impact_poly))
-    boundary = list(main_poly.exterior.coords)
-
-    boundary_pts = []
+    boundary = np.asarray(main_poly.exterior.coords)
     skip = max(1, len(boundary) // max(n_core // 2, 1))
-    for i, (x, y) in enumerate(boundary):
-        if i % skip == 0:
-            boundary_pts.append(Point(x, y))
+    boundary_pts = boundary[::skip]
 
-    core_pts = _poisson_points(main_poly, n_core)
-    pts = _lloyd_relax(main_poly, boundary_pts + core_pts, iterations=2)
+    core_pts = _poisson_points(main_poly, n_core, rng)
+    pts = _lloyd_relax(main_poly, np.concatenate([boundary_pts, core_pts]), iterations=2)
     cells = _voronoi_cells(main_poly, pts)
+    if not len(cells):
+        return []
 
-    subzones = []
-    idx = 1
-    for g in cells:
-        km2 = _poly_area_km2(g)
-        if km2 < target_km2 * 0.25:
-            continue
-
-        est_pop = int(round(km2 * density_default))
-        dens_val = est_pop / max(km2, 1e-6)
-
-        c = g.representative_point()
-        dist_km = _min_distance_to_boundary_km(main_poly, c)
+    # Per-cell area (km2 at each cell's own latitude), population and risk as arrays
+    lat = shapely.get_y(shapely.centroid(cells))
+    km2 = shapely.area(cells) * 111.32 * 111.32 * np.cos(np.radians(lat))
+    keep = km2 >= target_km2 * 0.25
+    cells, km2 = cells[keep], km2[keep]
+    if not len(cells):
+        return []
 
-        edge_risk = max(0.0, min(1.0, 1.0 - (dist_km / 1.5)))
-        dens_risk = max(0.0, min(1.0, dens_val / 9000.0))
-        risk = round(0.6 * edge_risk + 0.4 * dens_risk, 3)
+    est_pop = km2 * density_default
+    grid = load_popgrid(scenario, DATA_DIR)
+    if grid is not None:
+        # Zonal sums over the population raster where it covers the cell
+        counted = grid.sums(cells)
+        est_pop = np.where(np.isnan(counted), est_pop, counted)
+    est_pop = np.round(est_pop).astype(int)
+    dens_val = est_pop / np.maximum(km2, 1e-6)
+    reps = shapely.point_on_surface(cells)
+    dist_km = _min_distance_to_boundary_km(main_poly, reps)
+
+    edge_risk = np.clip(1.0 - dist_km / 1.5, 0.0, 1.0)
+    dens_risk = np.clip(dens_val / 9000.0, 0.0, 1.0)
+    risk = np.round(0.6 * edge_risk + 0.4 * dens_risk, 3)
+    rep_xy = shapely.get_coordinates(reps)
 
-        if risk >= 0.66:
+    subzones = []
+    for i, g in enumerate(cells):
+        idx = i + 1
+        r = float(risk[i])
+        if r >= 0.66:
             band = "red"
-        elif risk >= 0.33:
+        elif r >= 0.33:
             band = "orange"
         else:
             band = "green"
@@ -229,17 +241,53 @@ def _generate_voronoi_subzones(impact_poly, scenario):
             "name": f"Impact Subzone {idx}",
             "label": idx,
             "polygon": list(g.exterior.coords),
-            "centroid": [c.x, c.y],
-            "population": est_pop,
-            "density_per_km2": int(dens_val),
+            "centroid": [float(rep_xy[i, 0]), float(rep_xy[i, 1])],
+            "population": int(est_pop[i]),
+            "density_per_km2": int(dens_val[i]),
             "cutoff_min": cutoff_min,
-            "risk": risk,
+            "risk": r,
             "risk_band": band,
             "generated": True
         })
-        idx += 1
     return subzones
 
+@traced("hazard.ensemble")
+def _ensemble(scenario, zones, generated, per_zone):
+    """
+    Monte-Carlo mode (impact_seed.ensemble): adds each zone's probability of
+    being impacted and its expected impacted population to `per_zone`; zones
+    the central realization missed join once their probability reaches min_p.
+    """
+    seed = scenario.get("impact_seed") or {}
+    conf = ensemble_conf(seed)
+    center = seed.get("coastline_anchor") or (scenario.get("location") or {}).get("center")
+    if not conf or not center:
+        return None
+    zix = zone_index(zones)
+    polys = [(z["id"], zix.polygon(z["id"])) for z in zones]
+    polys = [(zid, p) for zid, p in polys if p is not None]
+    polys += [(gz["id"], Polygon(gz["polygon"])) for gz in generated]
+    pops = {z["id"]: int(z.get("population", 0)) for z in zones}
+    pops.update({gz["id"]: gz["population"] for gz in generated})
+    out = run_ensemble(center, float(seed.get("radius_km", 5.0)), int(seed.get("lobes", 5)), float(seed.get("jitter", 0.3)),
+                       conf, lambda bbox: resolve_landmask(scenario, DATA_DIR, bbox=bbox), polys)
+    if out is None:
+        return None
+    expected_total = 0
+    for zid, z in out["by_zone"].items():
+        expected = int(round(pops.get(zid, 0) * z["expected_fraction"]))
+        z["expected_affected"] = expected
+        entry = per_zone.get(zid)
+        if entry is None:
+            if z["p_impact"] < conf["min_p"]:
+                continue
+            entry = per_zone[zid] = {"population": pops.get(zid, 0), "affected_est": 0, "impact_fraction": 0.0}
+        entry["p_impact"] = z["p_impact"]
+        entry["expected_affected"] = expected
+        expected_total += expected
+    out["expected_total"] = expected_total
+    return out
+
 def hazard_agent(scenario, prev):
     # Build and clip impact to land, then densify (works for Polygon or MultiPolygon)
     impact_raw = _impact_polygon_raw(scenario)
@@ -252,41 +300,41 @@ def hazard_agent(scenario, prev):
     impacted_zone_features = []
     affected_total = 0
 
-    # Authored zones intersecting the impact
+    # Authored zones intersecting the impact (bbox-prefiltered, vectorized overlay)
     if impact_poly:
+        zix = zone_index(zones)
+        with span("hazard.overlay"):
+            overlap = zix.overlay(impact_poly)
         for z in zones:
             cutoffs[z["id"]] = z.get("cutoff_min", 60)
-            if not z.get("polygon"):
+            inter_area = overlap.get(z["id"])
+            if not inter_area:
                 continue
-            try:
-                poly = Polygon(z["polygon"])
-            except Exception:
-                continue
-            inter = poly.intersection(impact_poly)
-            if not inter.is_empty:
-                frac = inter.area / poly.area if poly.area else 0.0
-                est = int(round(frac * z.get("population", 0)))
-                per_zone[z["id"]] = {
-                    "population": z.get("population", 0),
-                    "affected_est": est,
-                    "impact_fraction": frac
-                }
-                affected_total += est
-                baseline = z.get("baseline_risk", 0.3)
-                band = "red" if baseline >= 0.66 else "orange" if baseline >= 0.33 else "green"
-                impacted_zone_features.append({
-                    "type": "Feature",
-                    "properties": {
-                        "zone": z["id"],
-                        "name": z.get("name"),
-                        "severity": baseline,
-                        "risk_band": band
-                    },
-                    "geometry": mapping(poly)
-                })
+            poly = zix.polygon(z["id"])
+            frac = inter_area / poly.area if poly.area else 0.0
+            est = int(round(frac * z.get("population", 0)))
+            per_zone[z["id"]] = {
+                "population": z.get("population", 0),
+                "affected_est": est,
+                "impact_fraction": frac
+            }
+            affected_total += est
+            baseline = z.get("baseline_risk", 0.3)
+            band = "red" if baseline >= 0.66 else "orange" if baseline >= 0.33 else "green"
+            impacted_zone_features.append({
+                "type": "Feature",
+                "properties": {
+                    "zone": z["id"],
+                    "name": z.get("name"),
+                    "severity": baseline,
+                    "risk_band": band
+                },
+                "geometry": mapping(poly)
+            })
 
     # Generated sub-zones
     generated = _generate_voronoi_subzones(impact_poly, scenario) if impact_poly else []
+    registry.inc("crisis_subzones_generated_total", len(generated))
     for gz in generated:
         cutoffs[gz["id"]] = gz.get("cutoff_min", 60)
         per_zone[gz["id"]] = {
@@ -307,6 +355,17 @@ def hazard_agent(scenario, prev):
             "geometry": mapping(Polygon(gz["polygon"]))
         })
 
+    ensemble = _ensemble(scenario, zones, generated, per_zone)
+    if ensemble:
+        for f in impacted_zone_features:
+            z = ensemble["by_zone"].get(f["properties"]["zone"])
+            if z:
+                f["properties"]["p_impact"] = z["p_impact"]
+        # Zones joining on probability alone (the central impact missed them) need a cutoff too
+        for z in zones:
+            if z["id"] in per_zone:
+                cutoffs.setdefault(z["id"], z.get("cutoff_min", 60))
+
     impact_geo = None
     if impact_poly:
         impact_geo = {
@@ -316,7 +375,7 @@ def hazard_agent(scenario, prev):
             ]
         }
 
-    return {
+    out = {
         "geojson": {"type": "FeatureCollection", "features": impacted_zone_features},
         "cutoffs": cutoffs,
         "impact": impact_geo,
@@ -324,3 +383,7 @@ def hazard_agent(scenario, prev):
         "impact_by_zone": per_zone,
         "generated_zones": generated
     }
+    if ensemble:
+        out["ensemble"] = ensemble
+        out["expected_population_total"] = ensemble["expected_total"]
+    return out
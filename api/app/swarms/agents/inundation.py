@@ -0,0 +1,204 @@
+import logging
+import math
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from shapely.ops import unary_union
+from .raster import load_raster, DATA_DIR
+from .landmask import resolve_landmask
+from .geom import zone_index
+from ...telemetry import traced
+
+KM_DEG_LAT = 110.574
+KM_DEG_LON = 111.320
+
+log = logging.getLogger(__name__)
+
+def inundation_conf(scenario):
+    """
+    `inundation` ({resolution_m, sea_kmh, land_kmh, runup_m, arrival_min,
+    max_cells}); an `elevation_grid` alone also turns the simulation on.
+    """
+    conf = scenario.get("inundation")
+    if not conf and not scenario.get("elevation_grid"):
+        return None
+    conf = conf if isinstance(conf, dict) else {}
+    eta = (scenario.get("event") or {}).get("eta_min", 60)
+    return {
+        "resolution_m": float(conf.get("resolution_m", 30.0)),
+        "sea_kmh": float(conf.get("sea_kmh", 60.0)),     # along the shore, shallow water
+        "land_kmh": float(conf.get("land_kmh", 12.0)),   # overland flow on flat ground
+        "runup_m": float(conf.get("runup_m", 10.0)),     # ground at or above this stays dry
+        "arrival_min": float(conf.get("arrival_min", eta)),  # wave at the anchor
+        "max_cells": int(conf.get("max_cells", 4_000_000)),
+    }
+
+def _relax(T, S, i, r, straight, diag):
+    # Row (or column) i from its neighbour r: straight and both diagonal moves
+    s, sr, t = S[i], S[r], T[r]
+    best = np.minimum(T[i], t + straight * 0.5 * (sr + s))
+    best[1:] = np.minimum(best[1:], t[:-1] + diag * 0.5 * (sr[:-1] + s[1:]))
+    best[:-1] = np.minimum(best[:-1], t[1:] + diag * 0.5 * (sr[1:] + s[:-1]))
+    T[i] = best
+
+@traced("inundation.sweep")
+def travel_times(S: np.ndarray, src, t0: float, dx_km: float, dy_km: float):
+    """
+    Arrival time (minutes) on an 8-connected grid from cell `src`, where S is
+    slowness (min/km, inf = impassable): Gauss-Seidel sweeps down, up, right
+    and left, each one vectorized across a whole row or column, repeated
+    until no cell improves. Each round settles paths with a few more turns,
+    so the cap grows with the grid (H + W rounds); a sweep that hits it is
+    logged and flagged. Returns (T, rounds, converged).
+    """
+    H, W = S.shape
+    T = np.full((H, W), np.inf)
+    T[src] = t0
+    Tt, St = T.T, S.T  # column sweeps work on the transposed views in place
+    diag = math.hypot(dx_km, dy_km)
+    converged = False
+    for rounds in range(1, H + W + 1):
+        before = T.copy()
+        for i in range(1, H):
+            _relax(T, S, i, i - 1, dy_km, diag)
+        for i in range(H - 2, -1, -1):
+            _relax(T, S, i, i + 1, dy_km, diag)
+        for j in range(1, W):
+            _relax(Tt, St, j, j - 1, dx_km, diag)
+        for j in range(W - 2, -1, -1):
+            _relax(Tt, St, j, j + 1, dx_km, diag)
+        if np.array_equal(before, T):
+            converged = True
+            break
+    return T, rounds, converged
+
+def _grid(bounds, res_m: float, max_cells: int):
+    minx, miny, maxx, maxy = bounds
+    lat = (miny + maxy) / 2
+    w_km = (maxx - minx) * KM_DEG_LON * math.cos(math.radians(lat))
+    h_km = (maxy - miny) * KM_DEG_LAT
+    res_km = max(res_m / 1000.0, math.sqrt(w_km * h_km / max_cells))
+    W, H = max(2, int(math.ceil(w_km / res_km))), max(2, int(math.ceil(h_km / res_km)))
+    xs = minx + (np.arange(W) + 0.5) * (maxx - minx) / W
+    ys = maxy - (np.arange(H) + 0.5) * (maxy - miny) / H  # row 0 is north
+    return xs, ys, w_km / W, h_km / H
+
+def _zone_arrivals(T, xs, ys, polys):
+    # Earliest arrival over the cells whose centre is in each polygon (its
+    # representative point's cell when it is smaller than a cell)
+    x0, dxd = xs[0], xs[1] - xs[0]
+    y0, dyd = ys[0], ys[1] - ys[0]  # dyd < 0
+    H, W = T.shape
+    out = np.full(len(polys), np.inf)
+    for k, p in enumerate(polys):
+        minx, miny, maxx, maxy = p.bounds
+        c0, c1 = max(0, int(math.floor((minx - x0) / dxd))), min(W, int(math.ceil((maxx - x0) / dxd)) + 1)
+        r0, r1 = max(0, int(math.floor((maxy - y0) / dyd))), min(H, int(math.ceil((miny - y0) / dyd)) + 1)
+        if c0 < c1 and r0 < r1:
+            gx, gy = np.meshgrid(xs[c0:c1], ys[r0:r1])
+            shapely.prepare(p)
+            inside = shapely.contains_xy(p, gx, gy)
+            if inside.any():
+                out[k] = T[r0:r1, c0:c1][inside].min()
+                continue
+        rp = p.representative_point()
+        c, r = int(round((rp.x - x0) / dxd)), int(round((rp.y - y0) / dyd))
+        if 0 <= c < W and 0 <= r < H:
+            out[k] = T[r, c]
+    return out
+
+def inundation_agent(scenario, land, hazard, prev):
+    """
+    Propagates the wave inland from `impact_seed.coastline_anchor` over a
+    local grid and turns the first arrival inside each zone and generated
+    subzone into its cutoff (minutes). Sea cells carry the wave along the
+    shore; on land the flow slows with elevation and stops at `runup_m`.
+    Without an elevation grid the ground is flat and the flood is bounded
+    by the hazard impact footprint instead.
+    """
+    conf = inundation_conf(scenario)
+    seed = scenario.get("impact_seed") or {}
+    anchor = seed.get("coastline_anchor") or (scenario.get("location") or {}).get("center")
+    if conf is None or not anchor:
+        return {}
+
+    impact = None
+    feats = ((hazard or {}).get("impact") or {}).get("features") or []
+    if feats:
+        impact = unary_union([shape(f["geometry"]) for f in feats])
+    if impact is not None and not impact.is_empty:
+        minx, miny, maxx, maxy = impact.bounds
+    else:
+        r = float(seed.get("radius_km", 5.0)) / KM_DEG_LON
+        minx, miny, maxx, maxy = anchor[0] - r, anchor[1] - r, anchor[0] + r, anchor[1] + r
+    pad_x, pad_y = (maxx - minx) * 0.1, (maxy - miny) * 0.1
+    bounds = (min(minx, anchor[0]) - pad_x, min(miny, anchor[1]) - pad_y,
+              max(maxx, anchor[0]) + pad_x, max(maxy, anchor[1]) + pad_y)
+    xs, ys, dx_km, dy_km = _grid(bounds, conf["resolution_m"], conf["max_cells"])
+    gx, gy = np.meshgrid(xs, ys)
+
+    if land and land.get("geojson"):
+        scenario = {**scenario, "land_mask": land["geojson"]}
+    land_geom = resolve_landmask(scenario, DATA_DIR, bbox=bounds)
+    elev_grid = load_raster(scenario.get("elevation_grid"), DATA_DIR)
+    elev = elev_grid.sample(gx, gy) if elev_grid is not None else np.zeros(gx.shape)
+
+    if land_geom is not None and not land_geom.is_empty:
+        shapely.prepare(land_geom)
+        on_land = shapely.contains_xy(land_geom, gx, gy)
+    else:
+        on_land = ~(elev <= 0)  # no mask: sea is at or below 0 m
+    floodable = on_land & ~(np.nan_to_num(elev, nan=conf["runup_m"]) >= conf["runup_m"])
+    if elev_grid is None and impact is not None and not impact.is_empty:
+        shapely.prepare(impact)
+        floodable &= shapely.contains_xy(impact, gx, gy)
+
+    # Slowness in minutes per km; dry land is impassable
+    rel = np.clip(1.0 - np.nan_to_num(elev, nan=0.0) / conf["runup_m"], 0.1, 1.0)
+    S = np.full(gx.shape, np.inf)
+    S[~on_land] = 60.0 / conf["sea_kmh"]
+    S[floodable] = 60.0 / (conf["land_kmh"] * rel[floodable])
+
+    W, H = len(xs), len(ys)
+    c = min(W - 1, max(0, int((anchor[0] - bounds[0]) / (bounds[2] - bounds[0]) * W)))
+    r = min(H - 1, max(0, int((bounds[3] - anchor[1]) / (bounds[3] - bounds[1]) * H)))
+    if not np.isfinite(S[r, c]):
+        # Anchor on dry ground: start from the nearest wet cell
+        wet = np.argwhere(np.isfinite(S))
+        if not len(wet):
+            return {}
+        r, c = wet[np.argmin((wet[:, 0] - r) ** 2 + (wet[:, 1] - c) ** 2)]
+    T, rounds, converged = travel_times(S, (int(r), int(c)), conf["arrival_min"], dx_km, dy_km)
+    if not converged:
+        log.warning("inundation sweep stopped after %d rounds on a %dx%d grid without converging", rounds, H, W)
+    T[~floodable] = np.inf  # report arrivals on land only
+
+    zix = zone_index(scenario.get("zones") or [])
+    ids, polys = [], []
+    for z in scenario.get("zones") or []:
+        p = zix.polygon(z["id"])
+        if p is not None:
+            ids.append(z["id"])
+            polys.append(p)
+    for gz in (hazard or {}).get("generated_zones") or []:
+        ids.append(gz["id"])
+        polys.append(shapely.Polygon(gz["polygon"]))
+    arrivals = _zone_arrivals(T, xs, ys, polys)
+
+    arrival_min, cutoffs = {}, {}
+    for zid, t in zip(ids, arrivals):
+        if np.isfinite(t):
+            arrival_min[zid] = round(float(t), 1)
+            cutoffs[zid] = max(1, int(math.floor(t)))
+    flooded = np.isfinite(T)
+    return {
+        "arrival_min": arrival_min,
+        "cutoffs": cutoffs,
+        "flooded_km2": round(float(flooded.sum()) * dx_km * dy_km, 3),
+        "max_arrival_min": round(float(T[flooded].max()), 1) if flooded.any() else None,
+        "grid": {"shape": [H, W], "cell_m": [round(dx_km * 1000, 1), round(dy_km * 1000, 1)],
+                 "bounds": [round(b, 6) for b in bounds], "rounds": rounds,
+                 "converged": converged, "elevation": elev_grid is not None},
+    }
+
+__all__ = ["inundation_agent", "inundation_conf", "travel_times"]
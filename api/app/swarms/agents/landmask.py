@@ -1,65 +1,157 @@
 # api/app/swarms/agents/landmask.py
 from pathlib import Path
+from collections import OrderedDict
+import hashlib
 import json
-from shapely.geometry import Polygon, MultiPolygon, shape
+import threading
+import shapely
+from shapely import STRtree
+from shapely.geometry import Polygon, MultiPolygon, shape, box
 from shapely.ops import unary_union
+from ...telemetry import traced
 
-def _load_landmask_from_scenario(scenario):
-    feats = (scenario.get("land_mask") or {}).get("features")
-    if not feats:
-        return None
+_CACHE_MAX = 8
+_cache: "OrderedDict[tuple, LandIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+# id(obj) -> (obj, sha1 of its JSON): the same mask/zones object is looked up
+# many times per run (hazard clip, ensemble windows, inundation), hashed once
+_digests: "OrderedDict[int, tuple]" = OrderedDict()
+
+class LandIndex:
+    """
+    Land polygons split into parts with an STRtree over them, so clipping an
+    impact only touches the parts near its bbox. The full union (prepared)
+    is built lazily for callers that still want the whole mask.
+    """
+    def __init__(self, parts):
+        self.parts = parts
+        self.tree = STRtree(parts)
+        self._union = None
+
+    @property
+    def union(self):
+        if self._union is None:
+            u = unary_union(self.parts).buffer(0)
+            shapely.prepare(u)
+            self._union = u
+        return self._union
+
+    @traced("land.clip")
+    def clip(self, bbox):
+        """Land within bbox (minx, miny, maxx, maxy); empty if no part is near."""
+        window = box(*bbox)
+        idx = self.tree.query(window)
+        if len(idx) == 0:
+            return Polygon()
+        local = unary_union([self.parts[i] for i in idx])
+        return local.intersection(window).buffer(0)
+
+def _split_parts(geoms):
+    parts = []
+    for g in geoms:
+        if isinstance(g, MultiPolygon):
+            parts.extend(p for p in g.geoms if not p.is_empty)
+        elif isinstance(g, Polygon) and not g.is_empty:
+            parts.append(g)
+    return parts
+
+def _polys_from_features(feats):
     polys = []
     for f in feats:
         try:
             g = shape(f["geometry"])
             if isinstance(g, (Polygon, MultiPolygon)) and not g.is_empty:
-                polys.append(g)
+                polys.append(g.buffer(0) if not g.is_valid else g)
         except Exception:
             continue
-    return unary_union(polys).buffer(0) if polys else None
+    return polys
+
+def _digest(obj) -> str:
+    with _cache_lock:
+        hit = _digests.get(id(obj))
+        if hit is not None and hit[0] is obj:
+            return hit[1]
+    digest = hashlib.sha1(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+    with _cache_lock:
+        _digests[id(obj)] = (obj, digest)  # holding obj keeps its id from being reused
+        while len(_digests) > _CACHE_MAX:
+            _digests.popitem(last=False)
+    return digest
+
+def _cached(key, build):
+    with _cache_lock:
+        idx = _cache.get(key)
+        if idx is not None:
+            _cache.move_to_end(key)
+            return idx
+    idx = build()
+    if idx is None:
+        return None
+    with _cache_lock:
+        _cache[key] = idx
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return idx
+
+@traced("land.index")
+def _index_from_features(feats):
+    parts = _split_parts(_polys_from_features(feats))
+    return LandIndex(parts) if parts else None
+
+def _load_landmask_from_scenario(scenario):
+    lm = scenario.get("land_mask") or {}
+    feats = lm.get("features")
+    if not feats:
+        return None
+    return _cached(("scenario", _digest(lm)), lambda: _index_from_features(feats))
 
 def _load_landmask_from_file(path: Path):
     try:
         if not path.exists():
             return None
-        data = json.loads(path.read_text())
-        feats = data.get("features") or []
-        polys = []
-        for f in feats:
-            try:
-                g = shape(f["geometry"])
-                if isinstance(g, (Polygon, MultiPolygon)) and not g.is_empty:
-                    polys.append(g)
-            except Exception:
-                continue
-        return unary_union(polys).buffer(0) if polys else None
+        st = path.stat()
+        key = ("file", str(path), st.st_mtime_ns, st.st_size)
+        def build():
+            data = json.loads(path.read_text())
+            return _index_from_features(data.get("features") or [])
+        return _cached(key, build)
     except Exception:
         return None
 
 def _land_union_from_zones(scenario):
     zones = scenario.get("zones") or []
-    geoms = []
-    for z in zones:
-        if z.get("polygon"):
-            try:
-                geoms.append(Polygon(z["polygon"]))
-            except Exception:
-                pass
-    return unary_union(geoms).buffer(0.0008) if geoms else None
+    def build():
+        geoms = []
+        for z in zones:
+            if z.get("polygon"):
+                try:
+                    geoms.append(Polygon(z["polygon"]))
+                except Exception:
+                    pass
+        if not geoms:
+            return None
+        return LandIndex(_split_parts([unary_union(geoms).buffer(0.0008)]))
+    if not zones:
+        return None
+    return _cached(("zones", _digest(zones)), build)
 
-def resolve_landmask(scenario, data_dir: Path):
+def resolve_landmask(scenario, data_dir: Path, bbox=None):
     """
     Returns a shapely geometry representing land:
     1) scenario.land_mask (if provided)
     2) data/ne_50m_land.geojson (if present)
     3) union of zone polygons (fallback)
+    Parsed masks are cached per content hash (computed once per object) /
+    file mtime. With `bbox`
+    only the land inside that window is returned.
     """
-    lm = _load_landmask_from_scenario(scenario)
-    if lm is not None:
-        return lm
-    ne = _load_landmask_from_file(data_dir / "ne_50m_land.geojson")
-    if ne is not None:
-        return ne
-    return _land_union_from_zones(scenario)
+    idx = _load_landmask_from_scenario(scenario)
+    if idx is None:
+        idx = _load_landmask_from_file(data_dir / "ne_50m_land.geojson")
+    if idx is None:
+        idx = _land_union_from_zones(scenario)
+    if idx is None:
+        return None
+    return idx.clip(bbox) if bbox is not None else idx.union
 
-__all__ = ["resolve_landmask"]
+__all__ = ["resolve_landmask", "LandIndex"]
@@ -0,0 +1,70 @@
+from pathlib import Path
+import numpy as np
+import shapely
+from .raster import Raster, load_raster, DATA_DIR
+from ...telemetry import traced
+
+class PopGrid(Raster):
+    """
+    Population raster (people per cell); nodata and negative cells count as
+    empty. Zonal sums read one window around all the polygons at once.
+    """
+    def window(self, bounds):
+        w = super().window(bounds)
+        if w is None:
+            return None
+        vals, xs, ys = w
+        vals[~(vals >= 0)] = 0.0
+        return vals, xs, ys
+
+    @traced("popgrid.sums")
+    def sums(self, polys, within=None) -> np.ndarray:
+        """
+        People in the cells whose centre lies in each polygon (and in `within`,
+        e.g. the impact mask); NaN where a polygon is entirely off the grid.
+        One window read (and one `within` test) covers every polygon; each
+        polygon then tests only its own slice of it.
+        """
+        out = np.full(len(polys), np.nan)
+        live = [i for i, p in enumerate(polys) if p is not None and not p.is_empty and self._span(p.bounds) is not None]
+        if not live:
+            return out
+        out[live] = 0.0
+        geoms = np.array([polys[i] for i in live], dtype=object)
+        b = shapely.total_bounds(geoms)
+        if within is not None:
+            if within.is_empty:
+                return out
+            wb = within.bounds
+            b = (max(b[0], wb[0]), max(b[1], wb[1]), min(b[2], wb[2]), min(b[3], wb[3]))
+            if b[0] > b[2] or b[1] > b[3]:
+                return out
+        w = self.window(b)
+        if w is None:
+            return out
+        vals, xs, ys = w
+        if within is not None:
+            # The mask is tested once over the shared window, not per polygon
+            shapely.prepare(within)
+            gx, gy = np.meshgrid(xs, ys)
+            vals = np.where(shapely.contains_xy(within, gx, gy), vals, 0.0)
+        x0, y0 = xs[0], ys[0]
+        H, W = vals.shape
+        for k, p in zip(live, geoms):
+            minx, miny, maxx, maxy = p.bounds
+            c0 = max(0, int(np.floor((minx - x0) / self.a)))
+            c1 = min(W, int(np.ceil((maxx - x0) / self.a)) + 1)
+            r0 = max(0, int(np.floor((maxy - y0) / self.e)))
+            r1 = min(H, int(np.ceil((miny - y0) / self.e)) + 1)
+            if c0 >= c1 or r0 >= r1:
+                continue
+            gx, gy = np.meshgrid(xs[c0:c1], ys[r0:r1])
+            shapely.prepare(p)
+            out[k] = vals[r0:r1, c0:c1][shapely.contains_xy(p, gx, gy)].sum()
+        return out
+
+def load_popgrid(scenario, data_dir: Path = DATA_DIR):
+    """The scenario's `population_grid` ({path, transform, nodata}) as a PopGrid; None if absent."""
+    return load_raster(scenario.get("population_grid"), data_dir, PopGrid)
+
+__all__ = ["PopGrid", "load_popgrid"]
@@ -0,0 +1,125 @@
+from pathlib import Path
+from collections import OrderedDict
+import math
+import threading
+import numpy as np
+
+try:
+    import rasterio  # optional: GeoTIFF grids
+    from rasterio.windows import Window
+except Exception:
+    rasterio = None
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+_CACHE_MAX = 4
+_cache: "OrderedDict[tuple, Raster]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+class Raster:
+    """
+    North-up single-band grid read by window: `.npy` files are memory-mapped
+    and GeoTIFFs read through rasterio, so callers only touch the cells they
+    ask about. `transform` is the affine (a, b, c, d, e, f): x = a*col + c,
+    y = e*row + f. Nodata and non-finite cells read as NaN.
+    """
+    def __init__(self, read, shape, transform, nodata=None):
+        a, b, c, d, e, f = (float(v) for v in transform[:6])
+        if b or d:
+            raise ValueError("grid must be north-up (no rotation terms)")
+        self.read = read
+        self.height, self.width = int(shape[0]), int(shape[1])
+        self.a, self.c, self.e, self.f = a, c, e, f
+        self.nodata = nodata
+        self.lock = threading.Lock()  # rasterio datasets are not thread-safe
+
+    def _span(self, bounds):
+        minx, miny, maxx, maxy = bounds
+        cx = sorted(((minx - self.c) / self.a, (maxx - self.c) / self.a))
+        ry = sorted(((miny - self.f) / self.e, (maxy - self.f) / self.e))
+        c0, c1 = max(0, math.floor(cx[0])), min(self.width, math.ceil(cx[1]))
+        r0, r1 = max(0, math.floor(ry[0])), min(self.height, math.ceil(ry[1]))
+        if c0 >= c1 or r0 >= r1:
+            return None
+        return r0, r1, c0, c1
+
+    def window(self, bounds):
+        """(values, cell-centre xs, cell-centre ys) of the cells meeting bounds; None if off the grid."""
+        span = self._span(bounds)
+        if span is None:
+            return None
+        r0, r1, c0, c1 = span
+        with self.lock:
+            vals = np.array(self.read(r0, r1, c0, c1), dtype=np.float64)
+        bad = ~np.isfinite(vals)
+        if self.nodata is not None:
+            bad |= vals == self.nodata
+        vals[bad] = np.nan
+        xs = self.c + (np.arange(c0, c1) + 0.5) * self.a
+        ys = self.f + (np.arange(r0, r1) + 0.5) * self.e
+        return vals, xs, ys
+
+    def sample(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Nearest-cell values at points, from one window read; NaN off the grid."""
+        out = np.full(np.shape(xs), np.nan)
+        if not np.size(xs):
+            return out
+        bounds = (float(np.min(xs)), float(np.min(ys)), float(np.max(xs)), float(np.max(ys)))
+        span = self._span(bounds)
+        if span is None:
+            return out
+        r0, r1, c0, c1 = span
+        vals, _, _ = self.window(bounds)
+        col = np.floor((xs - self.c) / self.a).astype(np.int64) - c0
+        row = np.floor((ys - self.f) / self.e).astype(np.int64) - r0
+        ok = (col >= 0) & (col < c1 - c0) & (row >= 0) & (row < r1 - r0)
+        out[ok] = vals[row[ok], col[ok]]
+        return out
+
+def _open(path: Path, conf: dict, cls):
+    transform = conf.get("transform")
+    nodata = conf.get("nodata")
+    if path.suffix.lower() in (".tif", ".tiff"):
+        if rasterio is None:
+            return None
+        ds = rasterio.open(path)
+        read = lambda r0, r1, c0, c1: ds.read(1, window=Window(c0, r0, c1 - c0, r1 - r0))
+        return cls(read, (ds.height, ds.width), transform or tuple(ds.transform)[:6],
+                   nodata if nodata is not None else ds.nodata)
+    if transform is None:
+        return None
+    arr = np.load(path, mmap_mode="r")
+    if arr.ndim == 3:
+        arr = arr[0]
+    return cls(lambda r0, r1, c0, c1: arr[r0:r1, c0:c1], arr.shape, transform, nodata)
+
+def load_raster(conf, data_dir: Path = DATA_DIR, cls=Raster):
+    """
+    A grid described by {path, transform, nodata} (a relative path is under
+    data/), opened once per file version; None if absent or unreadable.
+    """
+    conf = conf or {}
+    if not conf.get("path"):
+        return None
+    try:
+        path = Path(conf["path"])
+        if not path.is_absolute():
+            path = data_dir / path
+        st = path.stat()
+        key = (cls.__name__, str(path), st.st_mtime_ns, st.st_size, tuple(conf.get("transform") or ()), conf.get("nodata"))
+        with _cache_lock:
+            grid = _cache.get(key)
+            if grid is not None:
+                _cache.move_to_end(key)
+                return grid
+        grid = _open(path, conf, cls)
+        if grid is None:
+            return None
+        with _cache_lock:
+            _cache[key] = grid
+            while len(_cache) > _CACHE_MAX:
+                _cache.popitem(last=False)
+        return grid
+    except Exception:
+        return None
+
+__all__ = ["Raster", "load_raster"]
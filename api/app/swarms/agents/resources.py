@@ -1,6 +1,37 @@
+from .dispatch import build_fleet, dispatch
+
 def resources_agent(scenario, demand, transport, shelter, prev):
-    buses = scenario.get("assets", {}).get("buses", 10)
-    vans = scenario.get("assets", {}).get("med_vans", 5)
-    coverage = min(1.0, (buses*50 + vans*8) / 1000)
-    unmet = max(0, int(1000 - (buses*50 + vans*8)))
-    return {"buses": buses, "vans": vans, "coverage": coverage, "unmetDemand": unmet}
+    """
+    Schedules the bus / medical-van fleet against each assignment's cutoff
+    and reports coverage as the share of people that reach a shelter in time.
+    """
+    assets = scenario.get("assets", {})
+    buses = assets.get("buses", 10)
+    vans = assets.get("med_vans", 5)
+    fleet = build_fleet({**assets, "buses": buses, "med_vans": vans})
+
+    assignments = (transport or {}).get("assignments") or []
+    pickups = [a for a in assignments if a.get("people", 0) > 0]
+    sched = dispatch(fleet, pickups, load_min=int(assets.get("load_min", 5)))
+
+    # People to move: the demand estimate is the floor; transport's assignment
+    # (which may also count generated subzones) can only raise it
+    need = max(int((demand or {}).get("total_impacted", 0) or 0),
+               int((transport or {}).get("demandPeople", 0) or 0))
+    moved = sched["moved"]
+    coverage = min(1.0, moved / need) if need else 1.0
+    unmet = max(0, need - moved)
+    # Late pickups plus people transport could not place at all
+    by_zone = dict((transport or {}).get("unmetByZone") or {})
+    for zid, n in sched["unmetByZone"].items():
+        by_zone[zid] = by_zone.get(zid, 0) + n
+    return {
+        "buses": buses,
+        "vans": vans,
+        "coverage": coverage,
+        "unmetDemand": unmet,
+        "moved": moved,
+        "trips": sched["trips"],
+        "unmetByZone": by_zone,
+        "itineraries": sched["itineraries"],
+    }
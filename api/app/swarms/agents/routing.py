@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import heapq
+import json
+import math
+import threading
+import numpy as np
+import shapely
+from .geom import PointIndex, haversine_km
+
+_CACHE_MAX = 4
+_cache: "OrderedDict[tuple, RoadGraph]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+class RoadGraph:
+    """
+    Road network in CSR form. Rows are stored *reversed* (row v lists the
+    nodes u with an edge u -> v) so one search from all shelters yields the
+    best path from every node towards its nearest shelter.
+    """
+    def __init__(self, xy, src, dst, minutes):
+        self.xy = xy
+        order = np.argsort(dst, kind="stable")
+        self.src = src[order]
+        self.dst = dst[order]
+        self.minutes = minutes[order]
+        self.indptr = np.zeros(len(xy) + 1, dtype=np.int64)
+        np.add.at(self.indptr, self.dst + 1, 1)
+        self.indptr = np.cumsum(self.indptr)
+        self.indices = self.src
+        mid = (xy[self.src] + xy[self.dst]) / 2
+        self.mid_x, self.mid_y = mid[:, 0], mid[:, 1]
+        self.points = PointIndex(xy[:, 0], xy[:, 1])
+
+    @classmethod
+    def from_geojson(cls, fc, speed_kmh=20.0):
+        nodes = {}
+        xy = []
+        src, dst, speed = [], [], []
+        def node(c):
+            key = (round(c[0], 6), round(c[1], 6))
+            i = nodes.get(key)
+            if i is None:
+                i = nodes[key] = len(xy)
+                xy.append(key)
+            return i
+        for f in (fc or {}).get("features") or []:
+            g = f.get("geometry") or {}
+            props = f.get("properties") or {}
+            if g.get("type") == "LineString":
+                lines = [g.get("coordinates") or []]
+            elif g.get("type") == "MultiLineString":
+                lines = g.get("coordinates") or []
+            else:
+                continue
+            v = float(props.get("speed_kmh") or speed_kmh)
+            oneway = bool(props.get("oneway"))
+            for line in lines:
+                for a, b in zip(line, line[1:]):
+                    u, w = node(a), node(b)
+                    if u == w:
+                        continue
+                    src.append(u); dst.append(w); speed.append(v)
+                    if not oneway:
+                        src.append(w); dst.append(u); speed.append(v)
+        if not src:
+            return None
+        xy = np.asarray(xy, dtype=float)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        km = haversine_km(xy[src, 0], xy[src, 1], xy[dst, 0], xy[dst, 1])
+        minutes = km / np.asarray(speed) * 60.0
+        return cls(xy, src, dst, minutes)
+
+    def weights(self, impact_geom=None, mode="penalize", factor=4.0):
+        """Edge minutes with edges inside the impact penalized (or removed)."""
+        w = self.minutes
+        if impact_geom is None or impact_geom.is_empty:
+            return w
+        shapely.prepare(impact_geom)
+        inside = shapely.contains_xy(impact_geom, self.mid_x, self.mid_y)
+        if not inside.any():
+            return w
+        w = w.copy()
+        w[inside] = np.inf if mode == "remove" else w[inside] * factor
+        return w
+
+    def nearest_nodes(self, lon, lat):
+        """Nearest graph node and its distance in km for each query point."""
+        idx, km = self.points.nearest(lon, lat, k=1)
+        return idx[:, 0], km[:, 0]
+
+    def multi_source(self, sources, weights=None):
+        """
+        Dijkstra from several (node, start_minutes) sources at once.
+        Returns (minutes to nearest source, source index, next hop) per node.
+        """
+        n = len(self.xy)
+        w = (self.minutes if weights is None else weights).tolist()
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        dist = [math.inf] * n
+        label = [-1] * n
+        nxt = [-1] * n
+        heap = []
+        for k, (u, d0) in enumerate(sources):
+            if d0 < dist[u]:
+                dist[u] = d0
+                label[u] = k
+                heap.append((d0, u))
+        heapq.heapify(heap)
+        while heap:
+            d, v = heapq.heappop(heap)
+            if d > dist[v]:
+                continue
+            lv = label[v]
+            for e in range(indptr[v], indptr[v + 1]):
+                nd = d + w[e]
+                u = indices[e]
+                if nd < dist[u]:
+                    dist[u] = nd
+                    label[u] = lv
+                    nxt[u] = v
+                    heapq.heappush(heap, (nd, u))
+        return np.asarray(dist), np.asarray(label), nxt
+
+    def path(self, node, nxt):
+        coords = []
+        seen = 0
+        while node != -1 and seen <= len(nxt):
+            coords.append([float(self.xy[node, 0]), float(self.xy[node, 1])])
+            node = nxt[node]
+            seen += 1
+        return coords
+
+def _cached(key, build):
+    with _cache_lock:
+        g = _cache.get(key)
+        if g is not None:
+            _cache.move_to_end(key)
+            return g
+    g = build()
+    if g is None:
+        return None
+    with _cache_lock:
+        _cache[key] = g
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return g
+
+def load_road_graph(scenario, data_dir: Path):
+    """
+    Road graph from scenario["roads"] (inline FeatureCollection or a path
+    relative to the data dir), else data/roads.geojson. Cached per content.
+    """
+    conf = scenario.get("routing") or {}
+    speed = float(conf.get("speed_kmh", 20.0))
+    roads = scenario.get("roads")
+    if isinstance(roads, dict) and roads.get("features"):
+        digest = hashlib.sha1(json.dumps(roads, sort_keys=True).encode("utf-8")).hexdigest()
+        return _cached(("inline", digest, speed), lambda: RoadGraph.from_geojson(roads, speed))
+    path = data_dir / (roads if isinstance(roads, str) else "roads.geojson")
+    try:
+        if not path.exists():
+            return None
+        st = path.stat()
+        key = ("file", str(path), st.st_mtime_ns, st.st_size, speed)
+        return _cached(key, lambda: RoadGraph.from_geojson(json.loads(path.read_text()), speed))
+    except Exception:
+        return None
+
+__all__ = ["RoadGraph", "load_road_graph"]
@@ -1,4 +1,5 @@
-from shapely.geometry import Point, shape
+from shapely.geometry import shape
+from .geom import outside_mask
 
 def shelter_agent(scenario, hazard, prev):
     shelters = scenario.get("shelters", [])
@@ -7,10 +8,10 @@ def shelter_agent(scenario, hazard, prev):
     if impact and impact.get("features"):
         impact_geom = shape(impact["features"][0]["geometry"])
 
+    safe = outside_mask(impact_geom, [s["coord"][0] for s in shelters], [s["coord"][1] for s in shelters])
     feats = []
-    for s in shelters:
-        p = Point(s["coord"][0], s["coord"][1])
-        if impact_geom and impact_geom.contains(p):
+    for s, ok in zip(shelters, safe):
+        if not ok:
             continue
         feats.append({
             "type": "Feature",
@@ -1,27 +1,132 @@
 import math
+from pathlib import Path
 from typing import Dict, Any, List
-from shapely.geometry import shape, Point
-
-def _haversine_km(a, b):
-    from math import radians, sin, cos, sqrt, atan2
-    lon1, lat1 = a
-    lon2, lat2 = b
-    R = 6371.0
-    dlon = radians(lon2 - lon1)
-    dlat = radians(lat2 - lat1)
-    x = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * atan2(math.sqrt(x), math.sqrt(1 - x))
-    return R * c
-
-def _nearest_shelter(z_centroid, shelters):
-    best = None
-    best_km = 1e9
-    for s in shelters:
-        d = _haversine_km(z_centroid, s["coord"])
-        if d < best_km:
-            best_km = d
-            best = s
-    return best, best_km
+from shapely.geometry import shape
+from .routing import load_road_graph
+from .geom import PointIndex, outside_mask
+from .assignment import solve_min_cost_flow
+from ...telemetry import registry, span, traced
+
+MIN_PER_KM = 3.0
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+
+@traced("transport.route")
+def _route_zones(graph, zones, shelters, impact_geom, scenario):
+    """
+    One multi-source Dijkstra from every shelter over the road graph, with
+    edges inside the impact penalized (or removed). Off-network legs at
+    either end are costed as straight lines at MIN_PER_KM.
+    Returns {zone id: (shelter, eta_min, path coords)} for reachable zones.
+    """
+    conf = scenario.get("routing") or {}
+    weights = graph.weights(impact_geom, mode=conf.get("impact_edges", "penalize"),
+                            factor=float(conf.get("impact_penalty", 4.0)))
+    s_nodes, s_km = graph.nearest_nodes([s["coord"][0] for s in shelters], [s["coord"][1] for s in shelters])
+    dist, label, nxt = graph.multi_source([(int(n), km * MIN_PER_KM) for n, km in zip(s_nodes, s_km)], weights)
+    z_nodes, z_km = graph.nearest_nodes([z["centroid"][0] for z in zones], [z["centroid"][1] for z in zones])
+    out = {}
+    for z, n, km in zip(zones, z_nodes, z_km):
+        if not math.isfinite(dist[n]):
+            continue
+        s = shelters[label[n]]
+        eta_min = max(1, int(round(dist[n] + km * MIN_PER_KM)))
+        coords = [list(z["centroid"])] + graph.path(int(n), nxt) + [list(s["coord"])]
+        out[z["id"]] = (s, eta_min, coords)
+    return out
+
+def _zone_people(hazard, demand):
+    people = {zid: int(v.get("affected_est", 0)) for zid, v in ((hazard or {}).get("impact_by_zone") or {}).items()}
+    for zid, v in ((demand or {}).get("by_zone") or {}).items():
+        if zid in people:
+            people[zid] = int(v.get("impacted", people[zid]))
+    return people
+
+def _unassigned(people, impacted_zone_ids, assigned):
+    # Impacted zones that got no shelter (none safe, or no centroid to route from)
+    return {zid: people[zid] for zid in sorted(impacted_zone_ids - set(assigned)) if people.get(zid, 0) > 0}
+
+@traced("transport.assign")
+def _capacity_transport(scenario, zones, shelters, routed, near_idx, near_km, cutoffs, people, skip_route):
+    """
+    Capacity-constrained assignment: min-cost flow from zone impacted
+    population to shelter capacity over each zone's k nearest shelters.
+    Cost per person is the ETA plus `late_penalty` per minute past cutoff;
+    people that fit nowhere are reported as unmet instead of overfilling.
+    """
+    conf = scenario.get("assignment") or {}
+    late_penalty = float(conf.get("late_penalty", 10.0))
+    pos = {id(s): h for h, s in enumerate(shelters)}
+
+    supply, candidates, etas = [], [], []
+    for i, z in enumerate(zones):
+        zid = z["id"]
+        eta = {int(h): max(1, int(round(km * MIN_PER_KM))) for h, km in zip(near_idx[i], near_km[i])}
+        if zid in routed:
+            # Scale straight-line alternatives by this zone's road detour
+            s, r_eta, _ = routed[zid]
+            h0 = pos[id(s)]
+            detour = r_eta / eta[h0] if h0 in eta else 1.0
+            eta = {h: max(1, int(round(e * detour))) for h, e in eta.items()}
+            eta[h0] = r_eta
+        cutoff = int(cutoffs.get(zid, 60))
+        supply.append(max(0, people.get(zid, 0)))
+        candidates.append([(h, int(round(e + late_penalty * max(0, e - cutoff)))) for h, e in eta.items()])
+        etas.append(eta)
+
+    worst = max((c for cs in candidates for _, c in cs), default=0)
+    unmet_cost = max(int(conf.get("unmet_penalty", 10000)), worst + 1)
+    caps = [int(s.get("capacity", 200)) for s in shelters]
+    flows, unmet = solve_min_cost_flow(supply, caps, candidates, unmet_cost)
+
+    routes, assignments, risk_margins = [], [], []
+    load = [0] * len(shelters)
+    for z, zf, eta in zip(zones, flows, etas):
+        zid = z["id"]
+        cutoff = int(cutoffs.get(zid, 60))
+        for h, n in sorted(zf, key=lambda x: -x[1]):
+            s = shelters[h]
+            load[h] += n
+            e = eta[h]
+            risk_margin = cutoff - e
+            risk_margins.append(risk_margin)
+            assignments.append({
+                "zone": zid,
+                "shelter": s.get("id"),
+                "people": n,
+                "eta_min": e,
+                "cutoff_min": cutoff,
+                "risk_margin": risk_margin
+            })
+            if skip_route(zid):
+                continue
+            if zid in routed and routed[zid][0] is s:
+                path = routed[zid][2]
+            else:
+                path = [z["centroid"], s["coord"]]
+            z_name = z.get("name", zid or "Z")
+            s_name = s.get("name", s.get("id", "S"))
+            routes.append({
+                "type": "Feature",
+                "properties": {
+                    "from": z_name,
+                    "to": s_name,
+                    "eta_min": e,
+                    "people": n,
+                    "label": f"{z_name} → {s_name} ({e} min, {n} ppl)"
+                },
+                "geometry": {"type": "LineString", "coordinates": path}
+            })
+
+    return {
+        "mode": "capacity",
+        "routes": {"type": "FeatureCollection", "features": routes},
+        "assignments": assignments,
+        "riskMarginMin": min(risk_margins) if risk_margins else 0,
+        "shelterLoad": {s.get("id"): {"assigned": load[h], "capacity": caps[h]} for h, s in enumerate(shelters)},
+        "demandPeople": sum(supply),
+        "unmetDemand": sum(unmet),
+        "unmetByZone": {z["id"]: u for z, u in zip(zones, unmet) if u > 0},
+    }
 
 def transport_agent(scenario: Dict[str, Any], hazard: Dict[str, Any], demand: Dict[str, Any], prev: Dict[str, Any] | None):
     base_zones: List[Dict[str, Any]] = scenario.get("zones", [])
@@ -46,57 +151,90 @@ def transport_agent(scenario: Dict[str, Any], hazard: Dict[str, Any], demand: Di
     if impact and impact.get("features"):
         impact_geom = shape(impact["features"][0]["geometry"])
 
-    safe_shelters = []
-    for s in raw_shelters:
-        p = Point(s["coord"][0], s["coord"][1])
-        if impact_geom and impact_geom.contains(p):
-            continue
-        safe_shelters.append(s)
+    # Batched safety filter: one vectorized containment test for all shelters
+    safe = outside_mask(impact_geom, [s["coord"][0] for s in raw_shelters], [s["coord"][1] for s in raw_shelters])
+    safe_shelters = [s for s, ok in zip(raw_shelters, safe) if ok]
 
     routes = []
     assignments = []
-    MIN_PER_KM = 3.0
     cutoffs = (hazard or {}).get("cutoffs", {}) or {}
     impacted_zone_ids = set(((hazard or {}).get("impact_by_zone") or {}).keys())
     risk_margins = []
 
-    for z in zones:
-        zid = z.get("id")
-        if zid not in impacted_zone_ids:
-            continue
-        if not z.get("centroid"):
-            continue
-        if not safe_shelters:
-            continue
-        if _skip_generated(zid):
-            continue
+    # Every impacted zone is assigned; only route drawing is downsampled
+    capacity_mode = (scenario.get("assignment") or {}).get("mode") == "capacity"
+    todo = [z for z in zones if z.get("id") in impacted_zone_ids and z.get("centroid")]
+    # Real road paths when a road graph is available; straight lines otherwise
+    graph = load_road_graph(scenario, DATA_DIR) if safe_shelters and todo else None
+    routed = _route_zones(graph, todo, safe_shelters, impact_geom, scenario) if graph else {}
+
+    # k nearest safe shelters per zone in one batched query (KD-tree / matrix)
+    k_near = int((scenario.get("routing") or {}).get("k_nearest", 3))
+    if capacity_mode:
+        k_near = max(k_near, int((scenario.get("assignment") or {}).get("k", 5)))
+    near_idx = near_km = None
+    if safe_shelters and todo:
+        shelter_ix = PointIndex([s["coord"][0] for s in safe_shelters], [s["coord"][1] for s in safe_shelters])
+        with span("transport.nearest"):
+            near_idx, near_km = shelter_ix.nearest([z["centroid"][0] for z in todo], [z["centroid"][1] for z in todo], k=k_near)
+
+    people = _zone_people(hazard, demand)
+    if capacity_mode and near_idx is not None:
+        out = _capacity_transport(scenario, todo, safe_shelters, routed, near_idx, near_km,
+                                  cutoffs, people, _skip_generated)
+        left = _unassigned(people, impacted_zone_ids, [z["id"] for z in todo])
+        out["unmetByZone"].update(left)
+        out["unmetDemand"] += sum(left.values())
+        out["demandPeople"] += sum(left.values())
+        registry.inc("crisis_routes_total", len(out["routes"]["features"]))
+        return out
 
-        s, km = _nearest_shelter(z["centroid"], safe_shelters)
-        eta_min = max(1, int(round(km * MIN_PER_KM)))
+    for i, z in enumerate(todo if near_idx is not None else []):
+        zid = z.get("id")
+        if zid in routed:
+            s, eta_min, path = routed[zid]
+        else:
+            s, km = safe_shelters[near_idx[i, 0]], float(near_km[i, 0])
+            eta_min = max(1, int(round(km * MIN_PER_KM)))
+            path = [z["centroid"], s["coord"]]
         z_name = z.get("name", zid or "Z")
         s_name = s.get("name", s.get("id", "S"))
         cutoff = int(cutoffs.get(zid, 60))
         risk_margin = cutoff - eta_min
         risk_margins.append(risk_margin)
 
-        routes.append({
-            "type": "Feature",
-            "properties": {
-                "from": z_name,
-                "to": s_name,
-                "eta_min": eta_min,
-                "label": f"{z_name} → {s_name} ({eta_min} min)"
-            },
-            "geometry": {"type": "LineString", "coordinates": [z["centroid"], s["coord"]]}
-        })
+        if not _skip_generated(zid):
+            routes.append({
+                "type": "Feature",
+                "properties": {
+                    "from": z_name,
+                    "to": s_name,
+                    "eta_min": eta_min,
+                    "label": f"{z_name} → {s_name} ({eta_min} min)"
+                },
+                "geometry": {"type": "LineString", "coordinates": path}
+            })
 
         assignments.append({
             "zone": zid,
             "shelter": s.get("id"),
+            "people": max(0, people.get(zid, 0)),
             "eta_min": eta_min,
-            "risk_margin": risk_margin
+            "cutoff_min": cutoff,
+            "risk_margin": risk_margin,
+            "alternatives": [safe_shelters[j].get("id") for j in near_idx[i, 1:]]
         })
 
     routes_fc = {"type": "FeatureCollection", "features": routes}
+    registry.inc("crisis_routes_total", len(routes))
     min_margin = min(risk_margins) if risk_margins else 0
-    return {"routes": routes_fc, "assignments": assignments, "riskMarginMin": min_margin}
+    left = _unassigned(people, impacted_zone_ids, [a["zone"] for a in assignments])
+    return {
+        "mode": "nearest",
+        "routes": routes_fc,
+        "assignments": assignments,
+        "riskMarginMin": min_margin,
+        "demandPeople": sum(a["people"] for a in assignments) + sum(left.values()),
+        "unmetDemand": sum(left.values()),
+        "unmetByZone": left,
+    }
@@ -0,0 +1,190 @@
+from __future__ import annotations
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterator, Optional, Tuple
+import os
+import threading
+import time
+
+try:
+    from opentelemetry import trace as otel_trace  # optional: spans to a local collector
+except Exception:
+    otel_trace = None
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(kw: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in kw.items()))
+
+def _fmt(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+class Registry:
+    """
+    Dependency-free Prometheus-style counters and histograms. Samples are
+    plain dicts so a worker process can `dump()` them with its job result
+    and the API process can `merge()` them into its own registry.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.hists: Dict[str, Dict[Labels, list]] = {}  # [bucket counts..., sum, count]
+
+    def counter(self, name: str, help: str = ""):
+        with self.lock:
+            self.help.setdefault(name, ("counter", help))
+            self.counters.setdefault(name, {})
+
+    def histogram(self, name: str, help: str = ""):
+        with self.lock:
+            self.help.setdefault(name, ("histogram", help))
+            self.hists.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _labels(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _labels(labels)
+        with self.lock:
+            series = self.hists.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = [0] * (len(BUCKETS) + 2)
+            i = bisect_left(BUCKETS, seconds)
+            if i < len(BUCKETS):
+                h[i] += 1
+            h[-2] += seconds
+            h[-1] += 1
+
+    def dump(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "counters": {n: [[list(k), v] for k, v in s.items()] for n, s in self.counters.items()},
+                "hists": {n: [[list(k), list(h)] for k, h in s.items()] for n, s in self.hists.items()},
+            }
+
+    def merge(self, data: Optional[Dict[str, Any]]):
+        if not data:
+            return
+        with self.lock:
+            for name, series in (data.get("counters") or {}).items():
+                dst = self.counters.setdefault(name, {})
+                for k, v in series:
+                    key = tuple(tuple(x) for x in k)
+                    dst[key] = dst.get(key, 0.0) + v
+            for name, series in (data.get("hists") or {}).items():
+                dst = self.hists.setdefault(name, {})
+                for k, h in series:
+                    key = tuple(tuple(x) for x in k)
+                    cur = dst.get(key)
+                    dst[key] = list(h) if cur is None else [a + b for a, b in zip(cur, h)]
+
+    def reset(self):
+        with self.lock:
+            for s in self.counters.values():
+                s.clear()
+            for s in self.hists.values():
+                s.clear()
+
+    def render(self) -> str:
+        out = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                _, text = self.help.get(name, ("counter", ""))
+                out.append(f"# HELP {name} {text}")
+                out.append(f"# TYPE {name} counter")
+                for k, v in sorted(series.items()):
+                    out.append(f"{name}{_fmt(k)} {v:g}")
+            for name, series in sorted(self.hists.items()):
+                _, text = self.help.get(name, ("histogram", ""))
+                out.append(f"# HELP {name} {text}")
+                out.append(f"# TYPE {name} histogram")
+                for k, h in sorted(series.items()):
+                    acc = 0
+                    for b, n in zip(BUCKETS, h):
+                        acc += n
+                        out.append(f"{name}_bucket{_fmt(k, ('le', f'{b:g}'))} {acc}")
+                    out.append(f"{name}_bucket{_fmt(k, ('le', '+Inf'))} {h[-1]}")
+                    out.append(f"{name}_sum{_fmt(k)} {h[-2]:.6f}")
+                    out.append(f"{name}_count{_fmt(k)} {h[-1]}")
+        return "\n".join(out) + "\n"
+
+registry = Registry()
+registry.histogram("crisis_span_seconds", "Wall time of pipeline stages and geometry hot spots")
+registry.histogram("crisis_http_request_seconds", "API request latency (time to response start)")
+registry.counter("crisis_subzones_generated_total", "Voronoi subzones generated by the hazard agent")
+registry.counter("crisis_routes_total", "Evacuation routes drawn by the transport agent")
+registry.counter("crisis_jobs_total", "Pipeline jobs by final status")
+registry.counter("crisis_job_pool_restarts_total", "Job process pools replaced after a worker died")
+registry.counter("crisis_stages_reused_total", "Stages skipped because their inputs were unchanged")
+
+_tracer = None
+_otel_pid: Optional[int] = None
+
+def init_tracing():
+    """
+    Exports spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set and the
+    OpenTelemetry SDK is installed; call once per process (API and workers).
+    """
+    global _tracer, _otel_pid
+    if otel_trace is None or not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or _otel_pid == os.getpid():
+        return
+    _otel_pid = os.getpid()
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "crisis-api")}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        otel_trace.set_tracer_provider(provider)
+    except Exception:
+        pass  # SDK/exporter missing: fall back to whatever provider is configured
+    _tracer = otel_trace.get_tracer("crisis")
+
+def flush_tracing():
+    if _tracer is None:
+        return
+    try:
+        otel_trace.get_tracer_provider().force_flush()
+    except Exception:
+        pass
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[None]:
+    """Times a block into crisis_span_seconds{span=name} (and an OTel span if enabled)."""
+    t0 = time.perf_counter()
+    if _tracer is not None:
+        with _tracer.start_as_current_span(name, attributes={k: str(v) for k, v in attrs.items()}):
+            try:
+                yield
+            finally:
+                registry.observe("crisis_span_seconds", time.perf_counter() - t0, span=name)
+        return
+    try:
+        yield
+    finally:
+        registry.observe("crisis_span_seconds", time.perf_counter() - t0, span=name)
+
+def traced(name: str):
+    """Decorator form of `span` for hot-spot helpers."""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*a, **kw):
+            with span(name):
+                return fn(*a, **kw)
+        return inner
+    return wrap
+
+__all__ = ["Registry", "registry", "span", "traced", "init_tracing", "flush_tracing"]
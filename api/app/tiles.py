@@ -0,0 +1,179 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import math
+import threading
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import box, mapping, shape
+
+try:
+    import mapbox_vector_tile  # optional: binary MVT tiles
+except Exception:
+    mapbox_vector_tile = None
+
+# GeoJSON sections of the state that can be served as tiles
+LAYERS: Dict[str, Callable[[dict], Optional[dict]]] = {
+    "hazard": lambda s: (s.get("hazard") or {}).get("geojson"),
+    "impact": lambda s: (s.get("hazard") or {}).get("impact"),
+    "routes": lambda s: (s.get("transport") or {}).get("routes"),
+    "shelters": lambda s: (s.get("shelter") or {}).get("geojson"),
+    "demand": lambda s: (s.get("demand") or {}).get("geojson"),
+}
+MAX_ZOOM = 22
+TILE_PX = 256
+TOLERANCE_PX = 0.5  # simplify away detail smaller than half a screen pixel
+BUFFER = 1 / 32  # tile margin so strokes do not seam at tile edges
+EXTENT = 4096
+R_MERC = 6378137.0
+LAYERS_KEPT = 16
+TILES_KEPT = 4096
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) in lon/lat of XYZ tile z/x/y."""
+    n = 2 ** z
+    lat = lambda t: math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * t / n))))
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+def _to_mercator(xy: np.ndarray) -> np.ndarray:
+    lat = np.clip(xy[:, 1], -85.0511, 85.0511)
+    return np.column_stack((np.radians(xy[:, 0]) * R_MERC, np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * R_MERC))
+
+def _mvt_props(p: dict) -> dict:
+    # MVT values are scalars: drop nulls, JSON-encode nested values
+    out = {}
+    for k, v in p.items():
+        if v is None:
+            continue
+        out[k] = v if isinstance(v, (str, int, float, bool)) else json.dumps(v)
+    return out
+
+class LayerIndex:
+    """
+    One layer of one state version: source geometries plus lazily built,
+    per-zoom simplified copies with an STRtree each. Voronoi subzones form a
+    coverage and are simplified together so neighbours keep shared edges;
+    other features are simplified individually, preserving topology.
+    """
+    def __init__(self, fc: Optional[dict]):
+        feats = [f for f in (fc or {}).get("features") or [] if f.get("geometry")]
+        self.geoms = np.array([shape(f["geometry"]) for f in feats], dtype=object)
+        self.props = [f.get("properties") or {} for f in feats]
+        types = shapely.get_type_id(self.geoms) if len(feats) else np.empty(0, dtype=int)
+        polys = np.isin(types, (3, 6))
+        self.coverage = polys & np.array([bool(p.get("generated")) for p in self.props], dtype=bool)
+        self.simple = np.isin(types, (1, 2, 3, 5, 6)) & ~self.coverage  # points are left as-is
+        ys = shapely.get_coordinates(self.geoms)[:, 1] if len(feats) else np.zeros(1)
+        self.cos_lat = math.cos(math.radians(float(np.mean(ys)) if len(ys) else 0.0))
+        self.levels: Dict[int, Tuple[np.ndarray, STRtree]] = {}
+        self.lock = threading.Lock()
+
+    def tolerance(self, z: int) -> float:
+        return 360.0 / (TILE_PX * 2 ** z) * self.cos_lat * TOLERANCE_PX
+
+    def level(self, z: int) -> Tuple[np.ndarray, STRtree]:
+        with self.lock:
+            lv = self.levels.get(z)
+            if lv is not None:
+                return lv
+            tol = self.tolerance(z)
+            out = self.geoms.copy()
+            if self.coverage.any():
+                try:
+                    out[self.coverage] = shapely.coverage_simplify(self.geoms[self.coverage], tol)
+                except Exception:  # GEOS < 3.12 or not a clean coverage
+                    out[self.coverage] = shapely.simplify(self.geoms[self.coverage], tol, preserve_topology=True)
+            if self.simple.any():
+                out[self.simple] = shapely.simplify(self.geoms[self.simple], tol, preserve_topology=True)
+            lv = self.levels[z] = (out, STRtree(out))
+            return lv
+
+    def features(self, z: int, x: int, y: int) -> Tuple[np.ndarray, List[dict]]:
+        geoms, tree = self.level(z)
+        w, s, e, n = tile_bounds(z, x, y)
+        bx, by = (e - w) * BUFFER, (n - s) * BUFFER
+        bounds = (w - bx, s - by, e + bx, n + by)
+        idx = tree.query(box(*bounds))
+        if not len(idx):
+            return np.empty(0, dtype=object), []
+        idx = np.sort(idx)
+        clipped = shapely.clip_by_rect(geoms[idx], *bounds)
+        keep = ~shapely.is_empty(clipped)
+        return clipped[keep], [self.props[i] for i in idx[keep]]
+
+def encode_geojson(geoms: np.ndarray, props: List[dict]) -> bytes:
+    geoms = shapely.transform(geoms, lambda c: np.round(c, 6)) if len(geoms) else geoms
+    fc = {"type": "FeatureCollection",
+          "features": [{"type": "Feature", "properties": p, "geometry": mapping(g)} for g, p in zip(geoms, props)]}
+    return json.dumps(fc, separators=(",", ":")).encode()
+
+def encode_mvt(name: str, geoms: np.ndarray, props: List[dict], z: int, x: int, y: int) -> bytes:
+    w, s, e, n = tile_bounds(z, x, y)
+    (mx0, my0), (mx1, my1) = _to_mercator(np.array([[w, s], [e, n]]))
+    merc = shapely.transform(geoms, _to_mercator) if len(geoms) else geoms
+    layer = {"name": name, "features": [{"geometry": g, "properties": _mvt_props(p)} for g, p in zip(merc, props)]}
+    opts = {"quantize_bounds": (mx0, my0, mx1, my1), "extents": EXTENT}
+    try:
+        return mapbox_vector_tile.encode([layer], default_options=opts)
+    except TypeError:  # mapbox-vector-tile < 2 takes the options as keywords
+        return mapbox_vector_tile.encode([layer], **opts)
+
+class TileCache:
+    """Per-version LayerIndex objects and encoded tiles, both LRU-bounded."""
+    def __init__(self, layers_kept: int = LAYERS_KEPT, tiles_kept: int = TILES_KEPT):
+        self.layers: "OrderedDict[tuple, LayerIndex]" = OrderedDict()
+        self.tiles: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.layers_kept = layers_kept
+        self.tiles_kept = tiles_kept
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _layer(self, key: tuple, snap: dict, layer: str) -> LayerIndex:
+        with self.lock:
+            ix = self.layers.get(key)
+            if ix is not None:
+                self.layers.move_to_end(key)
+                return ix
+        ix = LayerIndex(LAYERS[layer](snap))
+        with self.lock:
+            ix = self.layers.setdefault(key, ix)
+            while len(self.layers) > self.layers_kept:
+                self.layers.popitem(last=False)
+        return ix
+
+    def tile(self, version_key: tuple, snap: dict, layer: str, z: int, x: int, y: int, fmt: str) -> bytes:
+        key = version_key + (layer, z, x, y, fmt)
+        with self.lock:
+            body = self.tiles.get(key)
+            if body is not None:
+                self.tiles.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+        geoms, props = self._layer(version_key + (layer,), snap, layer).features(z, x, y)
+        body = encode_mvt(layer, geoms, props, z, x, y) if fmt == "mvt" else encode_geojson(geoms, props)
+        with self.lock:
+            self.tiles[key] = body
+            while len(self.tiles) > self.tiles_kept:
+                self.tiles.popitem(last=False)
+        return body
+
+def parse_tile(layer: str, z: int, x: int, y: str) -> Tuple[int, str]:
+    """Validates the address and splits `y` into (row, format); raises ValueError."""
+    if layer not in LAYERS:
+        raise ValueError(f"unknown layer {layer!r}; expected one of {', '.join(LAYERS)}")
+    row, _, ext = y.partition(".")
+    fmt = {"": "mvt" if mapbox_vector_tile is not None else "geojson", "json": "geojson",
+           "geojson": "geojson", "mvt": "mvt", "pbf": "mvt"}.get(ext)
+    if fmt is None:
+        raise ValueError(f"unknown tile format {ext!r}")
+    if not row.isdigit() or not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= int(row) < 2 ** z:
+        raise ValueError("tile address out of range")
+    return int(row), fmt
+
+MEDIA_TYPES = {"mvt": "application/vnd.mapbox-vector-tile", "geojson": "application/geo+json"}
+
+__all__ = ["TileCache", "LayerIndex", "LAYERS", "MEDIA_TYPES", "parse_tile", "tile_bounds", "mapbox_vector_tile"]
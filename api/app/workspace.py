@@ -0,0 +1,111 @@
+from __future__ import annotations
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import re
+import threading
+
+from .state import State
+from .persistence import SnapshotStore
+
+SCENARIO_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class Scenario:
+    """One incident: its own uploaded scenario, State and snapshot store."""
+    def __init__(self, sid: str, root: Path, keep: int):
+        self.id = sid
+        self.dir = root
+        self.store = SnapshotStore(root, keep=keep)
+        self.state = State(root, store=self.store)
+        self.state.restore()
+
+    @property
+    def scenario_path(self) -> Path:
+        return self.dir / "scenario.json"
+
+    def close(self):
+        self.store.close()
+
+class Workspace:
+    """
+    Scenario-scoped states under <root>/<id>. At most `max_hot` scenarios
+    stay in memory (LRU); an evicted one is closed after its pending
+    snapshot writes land and is restored from its latest snapshot on the
+    next access. Pinned scenarios (a job in flight) are never evicted.
+    """
+    def __init__(self, root: Path, max_hot: int = 8, keep: int = 10,
+                 on_load: Optional[Callable[[Scenario], None]] = None):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_hot = max(1, max_hot)
+        self.keep = keep
+        self.on_load = on_load
+        self.hot: "OrderedDict[str, Scenario]" = OrderedDict()
+        self.pins: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def valid(sid: str) -> bool:
+        return bool(SCENARIO_ID.match(sid or ""))
+
+    def exists(self, sid: str) -> bool:
+        return self.valid(sid) and (sid in self.hot or (self.root / sid).is_dir())
+
+    def get(self, sid: str, create: bool = False) -> Optional[Scenario]:
+        if not self.valid(sid):
+            return None
+        with self.lock:
+            sc = self.hot.get(sid)
+            if sc is not None:
+                self.hot.move_to_end(sid)
+                return sc
+            path = self.root / sid
+            if not path.is_dir():
+                if not create:
+                    return None
+                path.mkdir(parents=True, exist_ok=True)
+            sc = Scenario(sid, path, self.keep)
+            if self.on_load is not None:
+                self.on_load(sc)
+            self.hot[sid] = sc
+            self._evict()
+            return sc
+
+    def _evict(self):
+        # Closed under the lock so a reload never restores before the last write lands
+        for sid in [s for s in self.hot if not self.pins.get(s)][:max(0, len(self.hot) - self.max_hot)]:
+            self.hot.pop(sid).close()
+
+    def pin(self, sid: str, create: bool = False) -> Optional[Scenario]:
+        """get() that keeps the scenario loaded until a matching unpin()."""
+        with self.lock:
+            self.pins[sid] = self.pins.get(sid, 0) + 1
+        sc = self.get(sid, create)
+        if sc is None:
+            self.unpin(sid)
+        return sc
+
+    def unpin(self, sid: str):
+        with self.lock:
+            n = self.pins.get(sid, 0) - 1
+            if n > 0:
+                self.pins[sid] = n
+            else:
+                self.pins.pop(sid, None)
+            self._evict()
+
+    def ids(self) -> List[str]:
+        on_disk = {p.name for p in self.root.iterdir() if p.is_dir() and self.valid(p.name)}
+        return sorted(on_disk | set(self.hot))
+
+    def describe(self, sid: str) -> dict:
+        sc = self.hot.get(sid)
+        return {"id": sid, "hot": sc is not None, "version": sc.state.version if sc is not None else None}
+
+    def close(self):
+        with self.lock:
+            while self.hot:
+                _, sc = self.hot.popitem(last=False)
+                sc.close()
+
+__all__ = ["Workspace", "Scenario", "SCENARIO_ID"]
@@ -0,0 +1,210 @@
+"""
+Scale benchmark for `run_pipeline`.
+
+    cd api && python -m bench.pipeline_bench                       # small, medium, large presets
+    cd api && python -m bench.pipeline_bench --scales large --repeat 5 --json base.json
+    cd api && python -m bench.pipeline_bench --compare base.json --threshold 1.3
+
+Each scale generates a synthetic coastal scenario (zone grid, inland
+shelters, jagged land mask, optional road grid) and runs the full pipeline
+from scratch: per-stage wall time on the first (cold) run and the median
+of the remaining (warm) runs, peak traced memory from a separate run under
+tracemalloc, and the serialized size of each output section. `--compare`
+exits non-zero when any stage's warm time regresses beyond `--threshold`x
+a saved baseline.
+"""
+from __future__ import annotations
+import argparse
+import gc
+import json
+import math
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.orchestrator import run_pipeline, STAGES
+
+CENTER = (-122.45, 37.76)
+KM_PER_DEG_LAT = 110.574
+
+SCALES = {
+    "small": {"zones": 9, "shelters": 5, "radius_km": 2.0, "target_km2": 0.6, "land_vertices": 200, "roads": 0},
+    "medium": {"zones": 100, "shelters": 30, "radius_km": 4.0, "target_km2": 0.15, "land_vertices": 2000, "roads": 30},
+    "large": {"zones": 400, "shelters": 120, "radius_km": 8.0, "target_km2": 0.05, "land_vertices": 10000, "roads": 80},
+}
+
+def _km_to_deg(km: float, lat: float):
+    return km / (111.320 * math.cos(math.radians(lat))), km / KM_PER_DEG_LAT
+
+def make_scenario(zones: int, shelters: int, radius_km: float, target_km2: float,
+                  land_vertices: int, roads: int = 0, seed: int = 0) -> dict:
+    """A coast running north-south through CENTER with land to the east."""
+    rng = random.Random(seed)
+    cx, cy = CENTER
+    span = max(radius_km * 3.0, 4.0)  # study area edge, km
+    dx, dy = _km_to_deg(span, cy)
+    x0, y0 = cx, cy - dy / 2
+
+    # Land mask: jagged coastline on the west edge, straight inland boundary.
+    coast = []
+    for i in range(max(land_vertices, 4)):
+        t = i / (max(land_vertices, 4) - 1)
+        wobble = 0.04 * dx * (math.sin(t * 40.0) + rng.uniform(-0.5, 0.5))
+        coast.append([x0 + wobble, y0 + t * dy])
+    ring = coast + [[x0 + dx * 1.5, y0 + dy], [x0 + dx * 1.5, y0], coast[0]]
+    land = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}}]}
+
+    # Authored zones: a grid over the western (coastal) half of the study area.
+    n = max(1, int(math.ceil(math.sqrt(zones))))
+    zw, zh = dx / 2 / n, dy / n
+    zone_list = []
+    for k in range(zones):
+        i, j = k % n, k // n
+        zx, zy = x0 + 0.05 * dx + i * zw, y0 + j * zh
+        poly = [[zx, zy], [zx + zw, zy], [zx + zw, zy + zh], [zx, zy + zh], [zx, zy]]
+        zone_list.append({
+            "id": f"Z{k + 1}", "name": f"Zone {k + 1}", "population": rng.randint(500, 20000),
+            "polygon": poly, "centroid": [zx + zw / 2, zy + zh / 2],
+            "cutoff_min": rng.choice([30, 45, 60, 90]), "baseline_risk": round(rng.uniform(0.1, 0.9), 2),
+        })
+
+    shelter_list = [{
+        "id": f"S{k + 1}", "name": f"Shelter {k + 1}", "capacity": rng.randint(200, 3000),
+        "coord": [x0 + dx * rng.uniform(0.55, 1.0), y0 + dy * rng.uniform(0.0, 1.0)],
+    } for k in range(shelters)]
+
+    scenario = {
+        "location": {"name": "Synthetic", "center": [cx, cy]},
+        "event": {"type": "tsunami", "eta_min": 90},
+        "impact_seed": {"coastline_anchor": [x0, cy], "radius_km": radius_km, "lobes": 5, "jitter": 0.3},
+        "auto_subzones": {"target_km2": target_km2, "route_every": 4, "seed": seed},
+        "defaults": {"density_per_km2": 4000, "cutoff_min": 60},
+        "zones": zone_list,
+        "shelters": shelter_list,
+        "assets": {"buses": max(2, zones // 5), "med_vans": max(1, zones // 10)},
+        "land_mask": land,
+    }
+    if roads:
+        scenario["roads"] = _road_grid(x0, y0, dx * 1.5, dy, roads)
+    return scenario
+
+def _road_grid(x0: float, y0: float, w: float, h: float, n: int) -> dict:
+    feats = []
+    for i in range(n):
+        for j in range(n):
+            x, y = x0 + w * i / (n - 1), y0 + h * j / (n - 1)
+            if i + 1 < n:
+                feats.append([[x, y], [x0 + w * (i + 1) / (n - 1), y]])
+            if j + 1 < n:
+                feats.append([[x, y], [x, y0 + h * (j + 1) / (n - 1)]])
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": c}} for c in feats]}
+
+def _run(path: Path, seed: int):
+    random.seed(seed)  # the impact blob draws from the global RNG
+    return run_pipeline(path, {})
+
+def _sizes(outputs: dict) -> dict:
+    return {k: len(json.dumps(outputs[k], separators=(",", ":"), default=str))
+            for k in ("hazard", "inundation", "demand", "transport", "shelter", "resources", "equity", "comms", "plan")}
+
+def bench_scale(name: str, params: dict, repeat: int, seed: int) -> dict:
+    scenario = make_scenario(seed=seed, **params)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scenario.json"
+        path.write_text(json.dumps(scenario))
+
+        gc.collect()
+        t0 = time.perf_counter()
+        cold = _run(path, seed)
+        cold_s = time.perf_counter() - t0
+        warm = [_run(path, seed)["timings"] for _ in range(max(0, repeat - 1))]
+
+        gc.collect()
+        tracemalloc.start()
+        out = _run(path, seed)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    stages = [s.name for s in STAGES] + ["total"]
+    warm_ms = {s: statistics.median(t[s] for t in warm) for s in stages} if warm else dict(cold["timings"])
+    return {
+        "scale": name,
+        "params": params,
+        "cold_ms": {s: cold["timings"][s] for s in stages},
+        "warm_ms": warm_ms,
+        "wall_s": round(cold_s, 3),
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "bytes": _sizes(out),
+        "counts": {
+            "generated_zones": len(out["hazard"].get("generated_zones") or []),
+            "routes": len(((out["transport"].get("routes") or {}).get("features")) or []),
+            "assignments": len(out["transport"].get("assignments") or []),
+        },
+    }
+
+def report(r: dict):
+    p = r["params"]
+    print(f"\n[{r['scale']}] zones={p['zones']} shelters={p['shelters']} radius_km={p['radius_km']} "
+          f"target_km2={p['target_km2']} land_vertices={p['land_vertices']} roads={p['roads']}")
+    print(f"  generated_zones={r['counts']['generated_zones']} routes={r['counts']['routes']} "
+          f"assignments={r['counts']['assignments']} peak={r['peak_mb']}MB")
+    print(f"  {'stage':<12}{'cold ms':>10}{'warm ms':>10}{'out KB':>10}")
+    for s, ms in r["cold_ms"].items():
+        kb = r["bytes"].get(s)
+        size = f"{kb / 1024:.1f}" if kb is not None else "-"  # land/impact_time are not served
+        print(f"  {s:<12}{ms:>10.1f}{r['warm_ms'][s]:>10.1f}{size:>10}")
+
+def compare(results, baseline_path: Path, threshold: float) -> int:
+    base = {r["scale"]: r for r in json.loads(baseline_path.read_text())}
+    bad = 0
+    for r in results:
+        b = base.get(r["scale"])
+        if b is None:
+            continue
+        for s, ms in r["warm_ms"].items():
+            ref = b["warm_ms"].get(s)
+            if ref and ref >= 1.0 and ms > ref * threshold:
+                print(f"REGRESSION {r['scale']}/{s}: {ms:.1f}ms vs {ref:.1f}ms baseline")
+                bad += 1
+    print(f"\n{bad} regression(s) beyond {threshold}x")
+    return 1 if bad else 0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scales", nargs="+", default=list(SCALES), choices=list(SCALES) + ["custom"])
+    ap.add_argument("--zones", type=int, default=50)
+    ap.add_argument("--shelters", type=int, default=20)
+    ap.add_argument("--radius-km", type=float, default=3.0)
+    ap.add_argument("--target-km2", type=float, default=0.3)
+    ap.add_argument("--land-vertices", type=int, default=1000)
+    ap.add_argument("--roads", type=int, default=0, help="road grid size (n x n nodes), 0 for straight lines")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", type=Path, default=None, help="write results here")
+    ap.add_argument("--compare", type=Path, default=None, help="baseline written by --json")
+    ap.add_argument("--threshold", type=float, default=1.3)
+    args = ap.parse_args()
+
+    results = []
+    for name in args.scales:
+        params = SCALES.get(name) or {
+            "zones": args.zones, "shelters": args.shelters, "radius_km": args.radius_km,
+            "target_km2": args.target_km2, "land_vertices": args.land_vertices, "roads": args.roads,
+        }
+        r = bench_scale(name, params, args.repeat, args.seed)
+        report(r)
+        results.append(r)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.compare:
+        sys.exit(compare(results, args.compare, args.threshold))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Latency/throughput benchmark for /qa against the offline stub backend.
+
+    cd api && python -m bench.qa_bench --requests 200 --concurrency 1 8 32
+    cd api && python -m bench.qa_bench --url http://127.0.0.1:8080   # a running server (needs httpx)
+
+In-process mode swaps the QA backend for `StubClient` (fixed time to first
+token, fixed token rate) and replays a mix of repeated and distinct
+open-ended questions through `answer_stream`, reporting time-to-first-token
+and full-answer latency percentiles, throughput, cache hit rate and how
+many model calls were actually made.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import random
+import time
+
+from app.services import qa
+from app.services.model_client import StubClient
+
+QUESTIONS = [
+    "Why is {z} assigned to that shelter?",
+    "Explain the plan for {z}.",
+    "What should responders in {z} watch out for?",
+    "Summarize the tradeoffs for {z}.",
+]
+
+def _pct(xs, p):
+    if not xs:
+        return float("nan")
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100.0 * len(xs)))]
+
+def _workload(n: int, distinct: int, seed: int):
+    rng = random.Random(seed)
+    pool = [QUESTIONS[i % len(QUESTIONS)].format(z=f"Z{i}") for i in range(distinct)]
+    return [rng.choice(pool) for _ in range(n)]
+
+def _state(version: int):
+    zones = [{"zone": f"Z{i}", "shelter": f"S{i % 7}", "people": 100 + i, "eta_min": 10, "cutoff_min": 60,
+              "risk_margin": 50} for i in range(200)]
+    return {"version": version, "transport": {"mode": "nearest", "assignments": zones, "riskMarginMin": 50},
+            "demand": {"by_zone": {z["zone"]: {"population": 1000, "impacted": z["people"]} for z in zones}}}
+
+async def _one(ask, q, ttft, total):
+    t0 = time.perf_counter()
+    first = None
+    async for _ in ask(q):
+        if first is None:
+            first = time.perf_counter() - t0
+    ttft.append(first if first is not None else time.perf_counter() - t0)
+    total.append(time.perf_counter() - t0)
+
+async def run(args, concurrency: int, version: int):
+    ttft, total = [], []
+    sem = asyncio.Semaphore(concurrency)
+    work = _workload(args.requests, args.distinct, args.seed)
+
+    if args.url:
+        import httpx
+        client = httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=concurrency))
+
+        async def ask(q):
+            async with client.stream("POST", args.url.rstrip("/") + "/qa/stream", json={"query": q}) as r:
+                async for chunk in r.aiter_text():
+                    yield chunk
+    else:
+        stub = StubClient(args.latency_ms, args.tokens_per_s, max_concurrency=args.model_concurrency,
+                          timeout=60, retries=0)
+        qa.set_client(stub)
+        qa.cache = qa.AnswerCache(qa.cache.maxsize, qa.cache.ttl)
+        state = _state(version)
+
+        async def ask(q):
+            async for tok in qa.answer_stream(q, state):
+                yield tok
+
+    async def bounded(q):
+        async with sem:
+            await _one(ask, q, ttft, total)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(bounded(q) for q in work))
+    elapsed = time.perf_counter() - t0
+
+    print(f"concurrency={concurrency} requests={args.requests} distinct={args.distinct}")
+    print(f"  throughput {args.requests / max(elapsed, 1e-9):,.1f} req/s ({elapsed:.2f}s)")
+    print(f"  ttft  p50={_pct(ttft, 50) * 1e3:.1f}ms p99={_pct(ttft, 99) * 1e3:.1f}ms")
+    print(f"  total p50={_pct(total, 50) * 1e3:.1f}ms p99={_pct(total, 99) * 1e3:.1f}ms")
+    if args.url:
+        await client.aclose()
+    else:
+        print(f"  cache {qa.cache.stats()}")
+        print(f"  model {stub.stats()}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--distinct", type=int, default=20)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--tokens-per-s", type=float, default=50.0)
+    ap.add_argument("--model-concurrency", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--url", default=None)
+    args = ap.parse_args()
+    for i, c in enumerate(args.concurrency):
+        # A fresh state version per run so earlier runs never warm the cache.
+        asyncio.run(run(args, c, version=i + 1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Fan-out benchmark for the /stream broadcaster.
+
+    cd api && python -m bench.stream_bench --subscribers 1000 --events 50
+
+Starts N in-process subscribers (plus a few deliberately slow ones),
+publishes version-change events from a background thread the way the job
+manager does, and reports delivery latency percentiles, resyncs sent to
+slow clients, and the publisher-side cost per event.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from app.broadcast import Broadcaster, sse
+
+async def _consumer(sub, latencies, delay=0.0):
+    while True:
+        msg = await sub.queue.get()
+        if msg.startswith(b"event: state"):
+            sent = float(msg.split(b"data: ", 1)[1].split(b",", 1)[0].split(b":", 1)[1])
+            latencies.append(time.perf_counter() - sent)
+        if delay:
+            await asyncio.sleep(delay)
+
+def _pct(xs, p):
+    if not xs:
+        return float("nan")
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100.0 * len(xs)))]
+
+async def run(subscribers: int, events: int, slow: int, payload_kb: int, interval: float):
+    b = Broadcaster()
+    b.bind(asyncio.get_running_loop())
+    latencies, slow_lat = [], []
+    subs = [b.subscribe() for _ in range(subscribers)]
+    slow_subs = [b.subscribe() for _ in range(slow)]
+    tasks = [asyncio.create_task(_consumer(s, latencies)) for s in subs]
+    tasks += [asyncio.create_task(_consumer(s, slow_lat, delay=interval * 20)) for s in slow_subs]
+
+    pad = b"x" * (payload_kb * 1024)
+    publish_cost = []
+
+    def publisher():
+        for v in range(1, events + 1):
+            t0 = time.perf_counter()
+            body = b'{"sent":' + repr(time.perf_counter()).encode() + b',"version":' + str(v).encode() + b',"pad":"' + pad + b'"}'
+            b.publish(sse("state", body), v)
+            publish_cost.append(time.perf_counter() - t0)
+            time.sleep(interval)
+
+    t0 = time.perf_counter()
+    th = threading.Thread(target=publisher)
+    th.start()
+    while th.is_alive():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - t0
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    expected = subscribers * events
+    print(f"subscribers={subscribers} slow={slow} events={events} payload={payload_kb}KB")
+    print(f"  delivered {len(latencies)}/{expected} to fast clients in {elapsed:.2f}s "
+          f"({len(latencies) / max(elapsed, 1e-9):,.0f} msg/s)")
+    print(f"  fast clients resynced: {sum(s.dropped for s in subs)}")
+    print(f"  latency p50={_pct(latencies, 50) * 1e3:.2f}ms p99={_pct(latencies, 99) * 1e3:.2f}ms "
+          f"max={max(latencies or [0]) * 1e3:.2f}ms")
+    print(f"  publisher cost/event mean={statistics.mean(publish_cost) * 1e6:.1f}us")
+    print(f"  slow clients: resyncs={sum(s.dropped for s in slow_subs)} "
+          f"max queue={max((s.queue.qsize() for s in slow_subs), default=0)}/{b.maxsize}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--events", type=int, default=50)
+    ap.add_argument("--slow", type=int, default=5)
+    ap.add_argument("--payload-kb", type=int, default=16)
+    ap.add_argument("--interval", type=float, default=0.01)
+    args = ap.parse_args()
+    for n in args.subscribers:
+        asyncio.run(run(n, args.events, args.slow, args.payload_kb, args.interval))
+
+if __name__ == "__main__":
+    main()
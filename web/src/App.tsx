@@ -1,8 +1,16 @@
+import { useEffect } from "react"
 import TopBar from "./components/TopBar"
 import MapCanvas from "./components/MapCanvas"
 import ChatPanel from "./components/chatPanel"
+import { subscribeState } from "./lib/api"
+import { usePlanStore } from "./lib/store"
 
 export default function App() {
+  useEffect(() => subscribeState(
+    () => usePlanStore.getState().version,
+    (d) => usePlanStore.getState().setAll({ ...d.changed, version: d.version, updatedAt: d.updatedAt })
+  ), [])
+
   return (
     <div style={{ display: "grid", gridTemplateRows: "56px 1fr", height: "100vh" }}>
       <TopBar />
@@ -20,17 +20,29 @@ export default function ChatPanel() {
     setQ("")
     setMsgs(m => [...m, { role: "user", content: text }])
     setBusy(true)
+    let got = ""
+    const show = (content: string) =>
+      setMsgs(m => [...m.slice(0, -1), { role: "assistant", content }])
+    setMsgs(m => [...m, { role: "assistant", content: "…" }])
     try {
-      const r = await fetch("http://127.0.0.1:8080/qa",{
+      const r = await fetch("http://127.0.0.1:8080/qa/stream",{
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ query: text })
       })
-      const data = await r.json()
-      const a = data?.answer || "Sorry, I couldn't answer that."
-      setMsgs(m => [...m, { role: "assistant", content: a }])
+      if (!r.ok || !r.body) throw new Error(String(r.status))
+      const reader = r.body.getReader()
+      const dec = new TextDecoder()
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        got += dec.decode(value, { stream: true })
+        show(got)
+      }
+      got += dec.decode()
+      show(got.trim() || "Sorry, I couldn't answer that.")
     } catch {
-      setMsgs(m => [...m, { role: "assistant", content: "Request failed." }])
+      show(got ? got + "\n[connection lost]" : "Request failed.")
     } finally {
       setBusy(false)
     }
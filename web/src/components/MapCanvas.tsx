@@ -49,6 +49,11 @@ export default function MapCanvas() {
         if (f.geometry?.type !== "LineString") continue
         const coords = (f.geometry as any).coordinates as [number, number][]
         if (!coords?.length) continue
+        // Backend already returned a road path (offline routing engine)
+        if (coords.length > 2) {
+          out.push({ ...f, properties: { ...(f.properties || {}), style: "route_dotted" } })
+          continue
+        }
         const start = coords[0]
         const end = coords[coords.length - 1]
         try {
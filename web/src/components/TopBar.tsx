@@ -1,6 +1,6 @@
 import { useRef, useState } from "react"
 import { usePlanStore } from "../lib/store"
-import { uploadScenario, fetchState } from "../lib/api"
+import { uploadScenario, waitForJob, fetchStateSince } from "../lib/api"
 
 export default function TopBar() {
   const inputRef = useRef<HTMLInputElement>(null)
@@ -12,20 +12,13 @@ export default function TopBar() {
     if (!f) return
     setBusy(true)
     try {
-      await uploadScenario(f)
-      const state = await fetchState()
+      const { job } = await uploadScenario(f)
+      await waitForJob(job)
+      const delta = await fetchStateSince(usePlanStore.getState().version)
       setAll({
-        hazard: state.hazard,
-        demand: state.demand,
-        transport: state.transport,
-        shelter: state.shelter,
-        resources: state.resources,
-        equity: state.equity,
-        comms: state.comms,
-        plan: state.plan,
-        event: state.event,
-        version: state.version,
-        updatedAt: state.updatedAt
+        ...delta.changed,
+        version: delta.version,
+        updatedAt: delta.updatedAt
       })
     } finally {
       setBusy(false)
@@ -1,3 +1,5 @@
+import { decodeState } from "./geocodec"
+
 export const API_BASE = import.meta.env.VITE_API_BASE || "http://localhost:8080"
 
 export async function uploadScenario(file: File) {
@@ -8,10 +10,50 @@ export async function uploadScenario(file: File) {
   return r.json()
 }
 
+export async function fetchJob(id: string) {
+  const r = await fetch(`${API_BASE}/jobs/${id}`)
+  if (!r.ok) throw new Error("job failed")
+  return r.json()
+}
+
+export async function waitForJob(id: string, intervalMs = 500) {
+  for (;;) {
+    const job = await fetchJob(id)
+    if (job.status === "done") return job
+    if (job.status !== "queued" && job.status !== "running") throw new Error(`job ${job.status}`)
+    await new Promise(res => setTimeout(res, intervalMs))
+  }
+}
+
 export async function fetchState() {
-  const r = await fetch(`${API_BASE}/state`)
+  const r = await fetch(`${API_BASE}/state?encoding=compact`)
   if (!r.ok) throw new Error("state failed")
-  return r.json()
+  return decodeState(await r.json())
+}
+
+// Only the top-level sections that changed since `version` (full=true if too old)
+export async function fetchStateSince(version: number) {
+  const r = await fetch(`${API_BASE}/state?since=${version}&encoding=compact`)
+  if (!r.ok) throw new Error("state failed")
+  return decodeState(await r.json())
+}
+
+// Server push: `state` events carry the changed sections; on `resync` (we fell
+// behind) or a version gap, catch up with one /state?since= request.
+export function subscribeState(getVersion: () => number, apply: (delta: any) => void) {
+  const es = new EventSource(`${API_BASE}/stream`)
+  const catchUp = async () => apply(await fetchStateSince(getVersion()))
+  es.addEventListener("hello", (e) => {
+    const { version } = JSON.parse((e as MessageEvent).data)
+    if (version !== getVersion()) catchUp().catch(() => {})
+  })
+  es.addEventListener("state", (e) => {
+    const delta = JSON.parse((e as MessageEvent).data)
+    if (!delta.full && delta.since !== getVersion()) catchUp().catch(() => {})
+    else apply(delta)
+  })
+  es.addEventListener("resync", () => { catchUp().catch(() => {}) })
+  return () => es.close()
 }
 
 export async function postQA(query: string) {
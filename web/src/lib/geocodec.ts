@@ -0,0 +1,70 @@
+// Decoder for GET /state?encoding=compact (api/app/codec.py): geometries carry
+// "q" instead of "coordinates", one flat [x0, y0, dx1, dy1, ...] integer list
+// per ring/line scaled by `encoding.scale`; generated subzones point at their
+// hazard feature with "polygon_ref" (or carry "polygon_q") instead of "polygon".
+
+const DEPTH: Record<string, number> = {
+  Point: 0, MultiPoint: 1, LineString: 1, MultiLineString: 2, Polygon: 2, MultiPolygon: 3,
+}
+
+function line(q: number[], scale: number): number[][] {
+  const out: number[][] = new Array(q.length / 2)
+  let x = 0, y = 0
+  for (let i = 0; i < q.length; i += 2) {
+    x += q[i]
+    y += q[i + 1]
+    out[i / 2] = [x / scale, y / scale]
+  }
+  return out
+}
+
+function coords(q: any, depth: number, scale: number): any {
+  if (depth === 0) return [q[0] / scale, q[1] / scale]
+  if (depth === 1) return line(q, scale)
+  return q.map((c: any) => coords(c, depth - 1, scale))
+}
+
+function walk(v: any, scale: number): any {
+  if (Array.isArray(v)) return v.map(x => walk(x, scale))
+  if (v === null || typeof v !== "object") return v
+  if (v.type === "GeometryCollection" && v.geometries) {
+    return { ...v, geometries: v.geometries.map((g: any) => walk(g, scale)) }
+  }
+  if ("q" in v && v.type in DEPTH) {
+    const { q, ...rest } = v
+    return { ...rest, coordinates: coords(q, DEPTH[v.type], scale) }
+  }
+  const out: any = {}
+  for (const k in v) out[k] = walk(v[k], scale)
+  return out
+}
+
+function restoreSubzones(hazard: any, scale: number) {
+  const feats = hazard?.geojson?.features || []
+  hazard.generated_zones = (hazard.generated_zones || []).map((gz: any) => {
+    const { polygon_ref, polygon_q, ...rest } = gz
+    if (polygon_ref !== undefined) return { ...rest, polygon: feats[polygon_ref]?.geometry?.coordinates?.[0] }
+    if (polygon_q !== undefined) return { ...rest, polygon: line(polygon_q, scale) }
+    return gz
+  })
+}
+
+// Decodes sections of a compact /state body or of the `changed` map of a delta
+function decodeSections(sections: any, scale: number) {
+  const out: any = {}
+  for (const k in sections) {
+    out[k] = walk(sections[k], scale)
+    if (k === "hazard" && out[k]?.generated_zones) restoreSubzones(out[k], scale)
+  }
+  return out
+}
+
+// Returns a plain /state (or /state?since=) body; non-compact bodies pass through
+export function decodeState(body: any) {
+  const enc = body?.encoding
+  if (!enc || enc.name !== "qdelta") return body
+  const { encoding, ...rest } = body
+  if (rest.changed) return { ...rest, changed: decodeSections(rest.changed, enc.scale) }
+  const { version, updatedAt, ...sections } = rest
+  return { ...decodeSections(sections, enc.scale), version, updatedAt }
+}